@@ -0,0 +1,59 @@
+import functools
+import io
+import openai
+import pytest
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+
+@pytest.fixture(scope="session")
+def openai_client():
+    """One OpenAI client for the whole test session, passed to the generators as client=."""
+    from keys import KEY
+    return openai.OpenAI(api_key=KEY)
+
+
+@pytest.fixture(scope="session")
+def silent_mp3(tmp_path_factory):
+    """A second of silence, encoded once for the whole test session."""
+    path = tmp_path_factory.mktemp("silent") / "silent.mp3"
+    AudioSegment.silent(duration=1000).export(str(path), format="mp3")
+    return path
+
+
+@pytest.fixture(scope="session")
+def sine_440():
+    """Returns the 440 Hz tone of a given duration (ms), each duration synthesised once per test session."""
+    @functools.lru_cache(maxsize=None)
+    def sine(duration: int) -> AudioSegment:
+        return Sine(440).to_audio_segment(duration=duration)
+    return sine
+
+
+@pytest.fixture(scope="session")
+def sine_440_mp3(sine_440):
+    """Returns the MP3 encoding of sine_440(duration), each duration encoded once per test session."""
+    @functools.lru_cache(maxsize=None)
+    def sine_mp3(duration: int) -> bytes:
+        return sine_440(duration).export(io.BytesIO(), format="mp3").getvalue()
+    return sine_mp3
+
+
+@pytest.fixture
+def test_dir(tmp_path, monkeypatch):
+    """An empty directory for the test's audio files, which is also made the working directory
+    for the test (so files the code under test writes to the working directory land there too).
+    pytest cleans it up."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def pytest_addoption(parser):
+    parser.addoption("--live", action="store_true", default=False,
+                     help="also run the tests that make real OpenAI API calls")
+
+
+@pytest.fixture
+def live(request):
+    """True if the tests were run with --live."""
+    return request.config.getoption("--live")
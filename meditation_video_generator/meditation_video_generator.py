@@ -1,29 +1,182 @@
+import ast
+import asyncio
+import hashlib
 import json
 import random
+import re
 import shutil
-import time
+import subprocess
+import sys
 from PIL import Image, ImageDraw, ImageFont
 import textwrap
+import functools
+import numpy as np
 import platform
-from pedalboard_native import LowShelfFilter
-from typing import List
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Union
 import os
-from openai import OpenAI
 from .mp3_mixer import MP3Mixer
 from .mp3_merger import MP3Merger
 import requests
-from moviepy.editor import ImageClip, AudioFileClip
-from pedalboard import Pedalboard, Reverb, Gain, LowpassFilter
-from pedalboard.io import AudioFile
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from .visual_prompts_list import visual_prompts
-from elevenlabs.client import ElevenLabs
-from elevenlabs import play, save, VoiceSettings
-import elevenlabs
+
+# resolved once at import: the package directory holds the ambient files and their urls
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+_URLS_PATH = os.path.join(_MODULE_DIR, "ambient_files_urls.txt")
+# the banner font for each supported OS, looked up once at import
+_SYSTEM_FONT_PATH = {
+    "Darwin": "/Library/Fonts/Arial.ttf",
+    "Windows": "C:/Windows/Fonts/Arial.ttf",
+    "Linux": "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+}.get(platform.system(), "")
+# the per-part speech files written by create_meditation_text_audio_files
+_PART_FILE_RE = re.compile(r"meditation_part_(\d+)\.mp3")
 
 YELLOW = (255, 255, 0, 255)  # used to build the image text. 100% opaque
 BLUE = [0, 0, 255]  # used to build the image banner background. opacity filled in later.
 WHITE = (255, 255, 255, 255)  # used to build the image banner text. 100% opaque
 BLACK = [0, 0, 0]  # used to build the image banner text. 100% opaque
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    """
+    Make dst a duplicate of src without copying the data where possible:
+    a hardlink first, then a symlink, and a real copy as the last resort.
+    Later stages never modify these files in place (they write new files),
+    so sharing the data between the duplicates is safe.
+
+    :param src: Path to the existing file.
+    :param dst: Path of the duplicate to create.
+    """
+    # replace, never write through, an existing dst: it may itself be a link to src
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        try:
+            os.symlink(os.path.abspath(src), dst)
+        except OSError:
+            shutil.copy(src, dst)
+
+
+@functools.lru_cache(maxsize=256)
+def _load_font(font_path: str, font_size: int) -> ImageFont.FreeTypeFont:
+    """
+    Loads a TrueType font, parsing each font file and size only once per process.
+
+    :param font_path: Path to the font file.
+    :param font_size: Font size in points.
+    :return: The font.
+    """
+    return ImageFont.truetype(font_path, font_size)
+
+
+@functools.lru_cache(maxsize=256)
+def _x_metrics(font_path: str, font_size: int) -> tuple[int, int]:
+    """
+    The size of a capital X in a font, used to estimate line widths and heights.
+
+    :param font_path: Path to the font file.
+    :param font_size: Font size in points.
+    :return: The right and bottom coordinates of the X bounding box, in pixels.
+    """
+    # (getbox returns a tuple of 4 values, x1, y1, x2, y2)
+    bbox = _load_font(font_path, font_size).getbbox('X')
+    return bbox[2], bbox[3]
+
+
+@functools.lru_cache(maxsize=None)
+def _has_nvenc(ffmpeg_binary: str) -> bool:
+    """
+    Checks whether ffmpeg can encode H.264 on an NVIDIA GPU. Builds often list
+    h264_nvenc without a usable GPU, so this encodes a tiny test clip. The
+    answer is cached for the process.
+
+    :param ffmpeg_binary: The ffmpeg executable to check.
+    :return: True if h264_nvenc works.
+    """
+    try:
+        result = subprocess.run([ffmpeg_binary, "-hide_banner", "-loglevel", "error",
+                                 "-f", "lavfi", "-i", "color=size=256x256:duration=0.1",
+                                 "-c:v", "h264_nvenc", "-f", "null", "-"],
+                                capture_output=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return result.returncode == 0
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_http_session() -> requests.Session:
+    """
+    One requests session for the plain HTTP downloads (the generated images), so
+    that a batch of meditations keeps the connection to the image host alive
+    instead of a new TCP and TLS handshake for every image.
+
+    :return: The shared session.
+    """
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return session
+
+
+def _event_loop_running() -> bool:
+    """
+    :return: True if called from inside a running asyncio event loop (e.g. a notebook).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+# parts are synthesized (and translated) concurrently, so allow the client's built-in
+# exponential backoff a few more attempts when rate limited
+_OPENAI_MAX_RETRIES = 5
+
+
+def _openai_limits():
+    """
+    The connection limits for the OpenAI clients, keeping enough connections alive
+    for all the concurrent requests.
+    """
+    import httpx
+    return httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+
+@functools.lru_cache(maxsize=8)
+def _shared_openai(api_key: str):
+    """
+    One OpenAI client per API key for the whole process, so that generating many
+    meditations in a batch reuses the same connection pool (and TLS sessions)
+    instead of opening a new one for every generator.
+
+    :param api_key: OpenAI API key.
+    :return: The shared OpenAI client.
+    """
+    from openai import OpenAI, DefaultHttpxClient
+    return OpenAI(api_key=api_key, max_retries=_OPENAI_MAX_RETRIES,
+                  http_client=DefaultHttpxClient(limits=_openai_limits()))
+
+
+def _async_openai(api_key: str):
+    """
+    A new AsyncOpenAI client with the same retries and connection limits as the shared
+    client. It is not shared, because the async client's connections belong to the
+    event loop it is first used in, so use it as a context manager for one call only.
+
+    :param api_key: OpenAI API key.
+    :return: The AsyncOpenAI client.
+    """
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    return AsyncOpenAI(api_key=api_key, max_retries=_OPENAI_MAX_RETRIES,
+                       http_client=DefaultAsyncHttpxClient(limits=_openai_limits()))
+
+
 class MeditationVideoGenerator:
     def __init__(self, topic: str = "Mindfulness", length: float = 10, api_key: str = "",
                  base_on_text: bool = False,
@@ -61,6 +214,15 @@ class MeditationVideoGenerator:
                  elevenlabs_voice: str = "",
                  no_technique: bool = False,
                  use_hypnosis: bool = False,
+                 tts_max_workers: int = 8,
+                 tts_cache_dir: str = "",
+                 ignore_tts_cache: bool = False,
+                 use_ffmpeg_fx: bool = False,
+                 client=None,
+                 working_directory: str = "",
+                 ambient_cache_dir: str = "",
+                 summary_cache_dir: str = "",
+                 ignore_summary_cache: bool = False,
                  ):
         """
         Initializes the MeditationGenerator with an OpenAI API key.
@@ -103,6 +265,16 @@ class MeditationVideoGenerator:
         :param elevenlabs_key: Elevenlabs API key for accessing the speech synthesizer. If not an empty string, ElevenLabs speechsynth will be used intead of OpenAI.
         :param elevenlabs_voice: Elevenlabs voice to use for speech synthesis (if elevenlabs_key is not an empty string).
         :param no_technique: If True, do not include the meditation technique (breath, etc) in the meditation.
+        :param use_hypnosis: If True, generate a guided hypnosis rather than a meditation.
+        :param tts_max_workers: Maximum number of meditation parts to synthesize concurrently.
+        :param tts_cache_dir: Directory for caching synthesized speech. If empty, ~/.cache/meditation_video/tts is used.
+        :param ignore_tts_cache: If True, always synthesize speech rather than reusing cached audio (the cache is still refreshed).
+        :param use_ffmpeg_fx: If True, apply the audio effects with ffmpeg filters in one streaming pass instead of Pedalboard (falls back to Pedalboard if ffmpeg is unavailable). The reverb is approximated by an echo, so the sound differs slightly.
+        :param client: An already constructed OpenAI client to use instead of creating one from api_key. Speech is then synthesized through it too (in a thread pool, as it is not an async client).
+        :param working_directory: Directory for storing the audio files etc. If empty, a directory named after the topic is used. A directory passed in is never removed: overwriting it (or delete_meditation_workspace) only removes the meditation_part_<n>.mp3 files and the files named after the topic.
+        :param ambient_cache_dir: Directory for caching the decoded ambient sound files (about 10 MB per minute of audio each). If empty, ~/.cache/meditation_video/ambient is used.
+        :param summary_cache_dir: Directory for caching the banner summaries of long topics. If empty, ~/.cache/meditation_video/summaries is used.
+        :param ignore_summary_cache: If True, always ask the LLM for the banner summary rather than reusing a cached one (the cache is still refreshed).
         """
         # setting any of these to false switches off that part of the pipeline
         self.pipeline: dict[str, bool] = {
@@ -116,45 +288,15 @@ class MeditationVideoGenerator:
             "keywords": True
         }
         # construct the directory from the introspection of the class
-        ambient_files_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), sounds_dir)
+        ambient_files_dir = os.path.join(_MODULE_DIR, sounds_dir)
         # if it exists and it is empty of mp3s, then delete it
-        if (os.path.exists(ambient_files_dir) and
-            not [f for f in os.listdir(ambient_files_dir) if '.mp3' in f]):
+        if os.path.exists(ambient_files_dir) and not self._has_mp3(ambient_files_dir):
             print("Deleting empty ambient files directory.")
             shutil.rmtree(ambient_files_dir)
         # if it doesn't exist then create it and download the files in the urls in
         # the ambient_files_urls.txt file
         if not os.path.exists(ambient_files_dir):
-            # without this, the server will say:
-            """Not Acceptable!
-            An appropriate representation of the requested resource could not be found on this server. This error was generated by Mod_Security."""
-            user_agents = [
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
-                'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36',
-                'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Mobile/15E148 Safari/604.1',
-                'Mozilla/5.0 (Linux; Android 10; SM-G973F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.105 Mobile Safari/537.36',
-                'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:89.0) Gecko/20100101 Firefox/89.0',
-            ]
-            headers = {
-                'User-Agent': random.choice(user_agents),
-                # 'Referer': 'https://example.com',  # Optional: Add if the server requires it
-            }
-            print("Creating ambient files directory and downloading ambient music.")
-            try:
-                os.makedirs(ambient_files_dir)
-                with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),"ambient_files_urls.txt"), "r") as f:
-                    urls = f.read().splitlines()
-                    for url in urls:
-                        print(f"Downloading {os.path.basename(url)}")
-                        # Send a GET request to the URL
-                        response = requests.get(url, headers=headers)
-                        with open(os.path.join(ambient_files_dir, os.path.basename(url)), 'wb') as file:
-                                file.write(response.content)
-                        time.sleep(random.randint(1, 2))
-            except Exception as e:
-                # empty the directory
-                shutil.rmtree(ambient_files_dir)
-                raise e
+            self._download_ambient_files(ambient_files_dir)
         self.in_spanish = in_spanish
         self.limit_parts = limit_parts
         self.balance_odd = balance_odd
@@ -177,9 +319,13 @@ class MeditationVideoGenerator:
         self.elevenlabs_voice = elevenlabs_voice
 
         self.api_key = api_key
-        self.client = OpenAI(api_key=api_key)
+        # the OpenAI client is only created when first needed (see the client property),
+        # unless one is passed in
+        self._client = client
+        self._client_given = client is not None
         if self.elevenlabs_key:
             print("Using ElevenLabs speechsynth.")
+            from elevenlabs.client import ElevenLabs
             self.client11 = ElevenLabs(api_key=self.elevenlabs_key)
         self.model = "gpt-4o"
         self.subsections = []
@@ -189,7 +335,12 @@ class MeditationVideoGenerator:
         self.use_hypnosis = use_hypnosis
         self.topic_based_filename = self.topic.replace(" ", "_")[:20]  # in case topic too long
         # working directory for storing audio files etc
-        self.working_directory = self.topic_based_filename
+        self.working_directory = working_directory or self.topic_based_filename
+        # only the directory named after the topic is ever removed whole. A working_directory
+        # passed in may hold anything, so only the files this class writes are cleared from it
+        self._owns_working_directory = not working_directory
+        # the last working_directory that _assert_ready found to exist
+        self._ready_directory = ""
         # create the working directory if it doesnt exist
         if not os.path.exists(self.working_directory):
             os.makedirs(self.working_directory)
@@ -198,33 +349,31 @@ class MeditationVideoGenerator:
             resp = input(
                 f"The working directory '{self.working_directory}' already exists. Do you want to overwrite it? (y/n): ")
             if resp.lower() == "y" or resp.lower() == "yes":
-                shutil.rmtree(self.working_directory)
-                os.makedirs(self.working_directory)
+                self._clear_working_directory()
         else:
             print("WARNING: Forced overwriting of working directory")
-            shutil.rmtree(self.working_directory)
-            os.makedirs(self.working_directory)
+            self._clear_working_directory()
         self.sounds_dir = sounds_dir
-        self.mixer = MP3Mixer(mp3_file="TBD", binaural=binaural, working_dir=self.working_directory,
-                              sounds_dir=self.sounds_dir,
-                              binaural_fade_out_duration=binaural_fade_out_duration,
-                              # duration in seconds of the fade-out at the end of the binaural beats
-                              # how much binaural beats should be quieter than the input voice audio
-                              start_beat_freq=start_beat_freq,  # initial frequency difference for the binaural effect
-                              end_beat_freq=end_beat_freq,  # final frequency difference for the binaural effect
-                              base_freq=base_freq,  # base frequency for the binaural beats
-                              sample_rate=sample_rate,
-                              num_samples_to_chop=num_samples_to_chop,
-                              # number of samples to chop off the beginning of the ambient sound files
-                              fade_in_time=fade_in_time,
-                              # duration in seconds of the fade-in at the beginning of the ambient sound overlay
-                              fade_out_time=fade_out_time,
-                              # duration in seconds of the fade-out at the end of the ambient sound overlay
-                              power_ratio=power_ratio,  # how much ambient sound should be quieter than the input voice audio
-                              )
-        self.merger = MP3Merger(self.subsection_audio_files, duration=int(self.length * 60),
-                                balance_odd=self.balance_odd,
-                                balance_even=self.balance_even)
+        # the mixer and merger are only built when their pipeline stage first needs them
+        self._mixer_settings = dict(binaural=binaural,
+                                    sounds_dir=self.sounds_dir,
+                                    # duration in seconds of the fade-out at the end of the binaural beats
+                                    binaural_fade_out_duration=binaural_fade_out_duration,
+                                    start_beat_freq=start_beat_freq,  # initial frequency difference for the binaural effect
+                                    end_beat_freq=end_beat_freq,  # final frequency difference for the binaural effect
+                                    base_freq=base_freq,  # base frequency for the binaural beats
+                                    sample_rate=sample_rate,
+                                    # number of samples to chop off the beginning of the ambient sound files
+                                    num_samples_to_chop=num_samples_to_chop,
+                                    # duration in seconds of the fade-in at the beginning of the ambient sound overlay
+                                    fade_in_time=fade_in_time,
+                                    # duration in seconds of the fade-out at the end of the ambient sound overlay
+                                    fade_out_time=fade_out_time,
+                                    # how much ambient sound should be quieter than the input voice audio
+                                    power_ratio=power_ratio,
+                                    # where the decoded ambient files are cached
+                                    ambient_cache_dir=ambient_cache_dir,
+                                    )
         self.bass_boost = bass_boost
         self.beautiful_lady = beautiful_lady
         if not elevenlabs_key:
@@ -237,22 +386,20 @@ class MeditationVideoGenerator:
             self.voice = random.choice(self.voice_list)
         else:
             self.voice = random.choice(self.voice_list[:2])
-        self.pedalboard_fx_list = []
-        if self.bass_boost:
-            # The below is ideal for 1st male voice, but not first female voice
-            if self.voice != 'shimmer':
-                self.pedalboard_fx_list += [
-                    LowShelfFilter(cutoff_frequency_hz=150, gain_db=5.0, q=1)
-                ]
-            else:
-                self.pedalboard_fx_list += [
-                    LowShelfFilter(cutoff_frequency_hz=150, gain_db=3.0, q=1)
-                ]
-        self.pedalboard_fx_list += [
-            LowpassFilter(10000),
-            Reverb(room_size=0.04, wet_level=0.04)
-        ]
         self.engine = "tts-1-hd"
+        self.fx_block_size = 65536  # frames per block streamed through the audio effects (~1.5s at 44.1kHz)
+        self.elevenlabs_model = "eleven_multilingual_v2"
+        self.tts_max_workers = tts_max_workers
+        if not tts_cache_dir:
+            tts_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "meditation_video", "tts")
+        self.tts_cache_dir = tts_cache_dir
+        self.ignore_tts_cache = ignore_tts_cache
+        # banner summaries of long topics, keyed on the model and prompt
+        if not summary_cache_dir:
+            summary_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "meditation_video", "summaries")
+        self.summary_cache_dir = summary_cache_dir
+        self.ignore_summary_cache = ignore_summary_cache
+        self.use_ffmpeg_fx = use_ffmpeg_fx
         self.num_sentences = num_sentences
         self.technique = random.choice(["Watching the breath", "Body sensation", "Watching the thoughts",
                                         "Listening to sounds (but only mention sounds within the meditation track)."])
@@ -263,143 +410,410 @@ class MeditationVideoGenerator:
             output_type = "meditation"
         if use_hypnosis:
             output_type = "guided hypnosis"
+        # the prompt is assembled from parts and joined once at the end
+        prompt_parts = []
         if base_on_text:
-            self.prompt = f"""Generate a {output_type} based on the following text. 
-            Do not use any contractions at all, for example isn't, there's or we're:\n{text}"""
+            prompt_parts.append(f"""Generate a {output_type} based on the following text. 
+            Do not use any contractions at all, for example isn't, there's or we're:\n{text}""")
         else:
-            self.prompt = f"""Generate a {output_type} on the topic '{self.topic}'.
-            Do not use any contractions at all, for example isn't, there's or we're."""
-        self.prompt += f"The {output_type} should be {self.length} minutes long.\n"
-        self.prompt += f"""
+            prompt_parts.append(f"""Generate a {output_type} on the topic '{self.topic}'.
+            Do not use any contractions at all, for example isn't, there's or we're.""")
+        prompt_parts.append(f"The {output_type} should be {self.length} minutes long.\n")
+        prompt_parts.append(f"""
         Start with a welcome message part which has an introduction to the {output_type}.
         Finish with a closing message part which has a conclusion to the {output_type}.
         Break it down into multiple parts which will be read with pauses between them during {output_type}.
         Each part should only contain a thought by you on the topic and finish with a single action request, 
-        but may contain multiple pieces of background information or motivations as well."""
+        but may contain multiple pieces of background information or motivations as well.""")
         if not self.no_technique:
-            self.prompt += f"""The action request should be based on the meditation technique '{self.technique}'.
+            prompt_parts.append(f"""The action request should be based on the meditation technique '{self.technique}'.
             Keep the action request limited to this one technique. Do not mix techniques across the whole meditation.
             THE ACTION SHOULD BE THE LAST SENTENCE OF THE PART! Do not relate the action to the topic, just to the technique.
             Some may only be reminders to continue the focus on what was instructed a previous part.
             Do NOT put two actions in one subsection. Do NOT ask the listener to both take an action and consider or think about something!
-            """
+            """)
         elif not use_hypnosis:
-            self.prompt += f"""The action request should be a relaxing one, based on the meditation topic.."""
+            prompt_parts.append(f"""The action request should be a relaxing one, based on the meditation topic..""")
         else:
-            self.prompt += f"""The action request should be one designed to deepen the state of hypnosis. Ensure the hypnosis actions are consistent and coherent across parts of the procedure."""
+            prompt_parts.append(f"""The action request should be one designed to deepen the state of hypnosis. Ensure the hypnosis actions are consistent and coherent across parts of the procedure.""")
         if self.limit_parts > 0:
             if self.limit_parts < 3:
                 self.limit_parts = 3
                 print("WARNING: limit_parts must be at least 3 to include introduction and conclusion parts. Setting to 3.")
-            self.prompt += f"""
-            The entire JSON {output_type} should contain NO MORE THAN {self.limit_parts} meditation_part  keys.\n"""
+            prompt_parts.append(f"""
+            The entire JSON {output_type} should contain NO MORE THAN {self.limit_parts} meditation_part  keys.\n""")
         if not self.expand_on_section:
-            self.prompt += f"""
-            Each meditation_part value should be no more than {self.num_sentences} sentences long.\n"""
+            prompt_parts.append(f"""
+            Each meditation_part value should be no more than {self.num_sentences} sentences long.\n""")
         self.expansion_size = expansion_size
         if self.expand_on_section:
-            self.prompt += f"""Start each part's text with a {self.expansion_size} sentence 
+            prompt_parts.append(f"""Start each part's text with a {self.expansion_size} sentence 
                                     details relating to that part. 
                                     Insure the details
                                    demonstrate your in-depth knowledge of the section (and topic) and help 
-                                   the listener. Do not ask the listener to take actions or consider thoughts in this. \n """
+                                   the listener. Do not ask the listener to take actions or consider thoughts in this. \n """)
         if not affirmations_only and not use_hypnosis:
-            self.prompt += f"""
+            prompt_parts.append(f"""
             Whatever the topic of the meditation, embed it within the following meditation technique:\n
             {self.technique}. Do not talk about 'think about' or 'consider'.\n
-            """
+            """)
         json_subprompt = '''
-        Return the responses in JSON format like:\n
-        [
+        Return the responses as a JSON object like:\n
+        {"parts": [
             {"meditation_part_1": "The first part of the meditation text."},
             {"meditation_part_2": "The second part of the meditation text."},
             {"meditation_part_3": "The third part of the meditation text."}
             etc.
-        ]
+        ]}
         Add ellipsis '...' at the end of some sentences, to help humanise the speech.
         '''
         # repeat the below for emphasis
         if self.limit_parts > 0:
-            self.prompt += f"""
-            URGENT: The entire JSON {output_type} should contain NO MORE THAN {self.limit_parts} meditation_part JSON keys.\n""".upper()
+            prompt_parts.append(f"""
+            URGENT: The entire JSON {output_type} should contain NO MORE THAN {self.limit_parts} meditation_part JSON keys.\n""".upper())
         if not self.expand_on_section:
-            self.prompt += f"""
-            URGENT: Each meditation_part value should be no more than {self.num_sentences} sentences long.\n""".upper()
+            prompt_parts.append(f"""
+            URGENT: Each meditation_part value should be no more than {self.num_sentences} sentences long.\n""".upper())
         if affirmations_only:
             json_subprompt = json_subprompt.replace("meditation", "affirmation")
-        self.prompt += json_subprompt
+        prompt_parts.append(json_subprompt)
         if self.in_spanish:
-            self.prompt += "\n Responde en espanol."
+            prompt_parts.append("\n Responde en espanol.")
+        self.prompt = "".join(prompt_parts)
         self.opacity = image_background_opacity
         self.banner_at_bottom = banner_at_bottom
         self.banner_height_ratio = banner_height_ratio
         self.max_banner_words = max_banner_words
+        # the image prompt is only built if the image stage asks for it
+        self.output_type = output_type
+        self.use_legacy_visuals = use_legacy_visuals
+
+    @functools.cached_property
+    def image_prompt(self) -> str:
+        """
+        The DALL-E prompt for the meditation image, randomised on first use.
+        Assign a string to override it.
+        """
         #use_legacy_visuals = True
-        if use_legacy_visuals:
+        if self.use_legacy_visuals:
             races = ["white", "black", "asian", "hispanic", "pakistani", "iranian", "pacific islander"]
             if not self.beautiful_lady:
-                self.image_prompt = f"""
+                image_prompt_parts = [f"""
                     Image only. 
-                    Generate a beautiful image based on the {output_type} topic '{self.topic}'.
+                    Generate a beautiful image based on the {self.output_type} topic '{self.topic}'.
                     It should be relaxing and be photorealistic. 
-                    """
+                    """]
                 if random.random() < 0.5:
-                    self.image_prompt += " It should include a beautiful person."
+                    image_prompt_parts.append(" It should include a beautiful person.")
                 if random.random() < 0.5:
-                    self.image_prompt += " It should be in outer space."
+                    image_prompt_parts.append(" It should be in outer space.")
                 elif random.random() < 0.5:
-                    self.image_prompt += " It should be under or on the ocean."
+                    image_prompt_parts.append(" It should be under or on the ocean.")
                 if random.random() < 0.5:
-                    self.image_prompt += " It should be in the style of a random famous painter."
+                    image_prompt_parts.append(" It should be in the style of a random famous painter.")
                 else:
-                    self.image_prompt += " It should be in the style of a random famous artist."
-                self.image_prompt += " REMEMBER: image only. PHOTOREALISTIC."
+                    image_prompt_parts.append(" It should be in the style of a random famous artist.")
+                image_prompt_parts.append(" REMEMBER: image only. PHOTOREALISTIC.")
+                image_prompt = "".join(image_prompt_parts)
             else:
-                self.image_prompt = f"""Generate a beautiful image of a beautiful lady meditating.
+                image_prompt = f"""Generate a beautiful image of a beautiful lady meditating.
                     It should be relaxing and be photorealistic. Remember: image only.
                     They should be {random.choice(races)}."""
         else:
             # select a random image prompt from the list
-            self.image_prompt = random.choice(visual_prompts)
+            image_prompt = random.choice(visual_prompts)
             thumbnailer_prompt = "Ensure that the scene has strong contrast, a clear focal point, and bold, easily distinguishable shapes and colors that will stand out even at a small thumbnail size."
-            self.image_prompt += f"\n{thumbnailer_prompt}"
+            image_prompt += f"\n{thumbnailer_prompt}"
+        return image_prompt
+
+    @functools.cached_property
+    def mixer(self) -> MP3Mixer:
+        """
+        The MP3Mixer used to add binaural beats or ambient sound, built on first use.
+        """
+        return MP3Mixer(mp3_file="TBD", working_dir=self.working_directory, **self._mixer_settings)
+
+    @functools.cached_property
+    def merger(self) -> MP3Merger:
+        """
+        The MP3Merger used to merge the meditation parts, built on first use.
+        """
+        return MP3Merger(self.subsection_audio_files, duration=int(self.length * 60),
+                         balance_odd=self.balance_odd,
+                         balance_even=self.balance_even)
+
+    @property
+    def client(self):
+        """
+        The OpenAI client, fetched on first use so that importing and constructing
+        the generator stays fast when no API call is made. Generators with the same
+        API key share one client (see _shared_openai).
+        """
+        if self._client is None:
+            self._client = _shared_openai(self.api_key)
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+        self._client_given = value is not None
+
+    def _assert_ready(self, method: str, check_topic: bool = True) -> None:
+        """
+        Checks the working directory exists and, optionally, that topic_based_filename is set,
+        before a pipeline stage runs. The directory is only looked up again if it has changed
+        since the last successful check.
+
+        :param method: Name of the calling method, used in the error messages.
+        :param check_topic: Whether topic_based_filename must be non-empty.
+        """
+        if self.working_directory != self._ready_directory:
+            if not os.path.isdir(self.working_directory):
+                msg = f"Error: {method} - working_directory does not exist: {self.working_directory}"
+                raise FileNotFoundError(msg)
+            self._ready_directory = self.working_directory
+        if check_topic and self.topic_based_filename.strip() == "":
+            msg = f"Error: {method} - Empty topic_based_filename."
+            raise ValueError(msg)
+
+    def _working_files(self) -> list[str]:
+        """
+        The files in working_directory that this class writes: the meditation_part_<n>.mp3
+        speech files and the files named after the topic.
+
+        :return: Paths of the files.
+        """
+        prefix = f"{self.topic_based_filename}_"
+        with os.scandir(self.working_directory) as entries:
+            return [entry.path for entry in entries if not entry.is_dir(follow_symlinks=False)
+                    and (entry.name.startswith(prefix) or _PART_FILE_RE.fullmatch(entry.name))]
+
+    def _clear_working_directory(self):
+        """
+        Empties the working directory for a new meditation. The directory named after the
+        topic is removed and made again; from a working_directory that was passed in only
+        the files this class writes are removed.
+        """
+        if self._owns_working_directory:
+            shutil.rmtree(self.working_directory)
+            os.makedirs(self.working_directory)
+        else:
+            for path in self._working_files():
+                os.remove(path)
 
-    def send_prompt(self, prompt: str, use_json: bool = False) -> str:
+    # paths of the files passed from one pipeline stage to the next
+    @property
+    def _merged_path(self) -> str:
+        return os.path.join(self.working_directory, f"{self.topic_based_filename}_meditation_text_merged.mp3")
+
+    @property
+    def _merged_fx_path(self) -> str:
+        return os.path.join(self.working_directory, f"{self.topic_based_filename}_meditation_text_merged_fx.mp3")
+
+    @property
+    def _mixed_path(self) -> str:
+        return os.path.join(self.working_directory,
+                            f"{self.topic_based_filename}_meditation_text_merged_fx_mixed.mp3")
+
+    @property
+    def _image_path(self) -> str:
+        return os.path.join(self.working_directory, f"{self.topic_based_filename}_meditation_image.jpg")
+
+    @functools.cached_property
+    def pedalboard_fx_list(self) -> list:
+        """
+        The list of Pedalboard plugins applied to the merged speech by add_audio_fx.
+        Built on first use; assign a list to override it.
+        """
+        return self._build_fx_chain()
+
+    def _build_fx_chain(self) -> list:
+        """
+        Builds the Pedalboard effects chain for the chosen voice.
+
+        :return: List of Pedalboard plugins.
+        """
+        from pedalboard import LowShelfFilter, LowpassFilter, Reverb
+        fx_list = []
+        if self.bass_boost:
+            # The below is ideal for 1st male voice, but not first female voice
+            if self.voice != 'shimmer':
+                fx_list += [
+                    LowShelfFilter(cutoff_frequency_hz=150, gain_db=5.0, q=1)
+                ]
+            else:
+                fx_list += [
+                    LowShelfFilter(cutoff_frequency_hz=150, gain_db=3.0, q=1)
+                ]
+        fx_list += [
+            LowpassFilter(10000),
+            Reverb(room_size=0.04, wet_level=0.04)
+        ]
+        return fx_list
+
+    @staticmethod
+    def _has_mp3(directory: str) -> bool:
+        """
+        Checks whether a directory holds at least one MP3 file, stopping at the first one found.
+
+        :param directory: Directory to check.
+        :return: True if an MP3 file is found.
+        """
+        with os.scandir(directory) as entries:
+            return any(entry.name.endswith('.mp3') for entry in entries)
+
+    @staticmethod
+    def _download_ambient_files(ambient_files_dir: str) -> None:
+        """
+        Create the ambient files directory and download the ambient music listed in
+        ambient_files_urls.txt into it. The files are fetched concurrently over one
+        pooled session and streamed to disk. If any download fails the directory is
+        removed again, so the next run retries from scratch.
+
+        :param ambient_files_dir: Directory to download the ambient files into.
+        """
+        # without this, the server will say:
+        """Not Acceptable!
+        An appropriate representation of the requested resource could not be found on this server. This error was generated by Mod_Security."""
+        user_agents = [
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
+            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36',
+            'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Mobile/15E148 Safari/604.1',
+            'Mozilla/5.0 (Linux; Android 10; SM-G973F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.105 Mobile Safari/537.36',
+            'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:89.0) Gecko/20100101 Firefox/89.0',
+        ]
+        headers = {
+            'User-Agent': random.choice(user_agents),
+            # 'Referer': 'https://example.com',  # Optional: Add if the server requires it
+        }
+        # one session so the connections are kept alive and reused between files.
+        # Rate limiting and server errors are retried with a backoff.
+        session = requests.Session()
+        session.headers.update(headers)
+        retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+        session.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retries))
+
+        def download(url):
+            print(f"Downloading {os.path.basename(url)}")
+            with session.get(url, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                with open(os.path.join(ambient_files_dir, os.path.basename(url)), 'wb') as file:
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        file.write(chunk)
+
+        print("Creating ambient files directory and downloading ambient music.")
+        try:
+            os.makedirs(ambient_files_dir)
+            with open(_URLS_PATH, "r") as f:
+                urls = [url for url in f.read().splitlines() if url.strip()]
+            # only a few at a time to stay gentle on the server
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                list(executor.map(download, urls))
+        except Exception as e:
+            # empty the directory
+            shutil.rmtree(ambient_files_dir)
+            raise e
+        finally:
+            session.close()
+
+    def send_prompt(self, prompt: str, use_json: bool = False, n_samples: int = 1) -> Union[str, List[str]]:
+        """
+        Sends a prompt to the LLM.
+
+        :param prompt: The prompt to send.
+        :param use_json: If True, the response is a JSON object.
+        :param n_samples: Number of independent responses to generate in the one request.
+        :return: The response, or a list of the responses if n_samples is more than 1.
+        """
         if prompt.strip() == "":
             raise ValueError("Error: send_prompt - Empty prompt.")
-        content = {
-            "type": "text",
-            "text": prompt,
-        }
+        if n_samples < 1:
+            raise ValueError("Error: send_prompt - n_samples must be at least 1.")
+        kwargs = {}
+        if n_samples > 1:
+            # the prompt is sent (and billed) once for all the samples
+            kwargs["n"] = n_samples
         if use_json:
-            content["response_format"] = "json"
             if "json" not in prompt and "JSON" not in prompt:
                 raise ValueError("Error: send_prompt - JSON must be mentioned in a JSON prompt.")
+            # JSON mode makes the API return a single valid JSON object, with no fences or prose
+            kwargs["response_format"] = {"type": "json_object"}
         response = self.client.chat.completions.create(
             model=self.model,
             messages=[
                 {
                     "role": "user",
-                    "content": [
-                        content
-                    ]
+                    "content": prompt
                 }
-            ]
+            ],
+            **kwargs
         )
+        if n_samples > 1:
+            return [choice.message.content for choice in response.choices]
         return response.choices[0].message.content
 
+    @staticmethod
+    def _parse_llm_json(text: str):
+        """
+        Parses JSON returned by the LLM, tolerating the usual ways it goes wrong:
+        prose or fences around the JSON, and Python-style literals (single quotes,
+        True/None) instead of strict JSON. Never evaluates the text as code.
+
+        :param text: Raw response text.
+        :return: The parsed JSON value.
+        """
+        try:
+            return json.loads(text)
+        except ValueError:
+            pass
+        # cut away anything outside the outermost array or object
+        candidates = []
+        for open_char, close_char in (("[", "]"), ("{", "}")):
+            start, end = text.find(open_char), text.rfind(close_char)
+            if start != -1 and end > start:
+                candidates.append(text[start:end + 1])
+        # the outermost brackets come first
+        candidates.sort(key=len, reverse=True)
+        for candidate in candidates:
+            try:
+                return json.loads(candidate)
+            except ValueError:
+                pass
+        # last resort: Python literals only, so this is safe unlike eval
+        for candidate in candidates or [text]:
+            try:
+                return ast.literal_eval(candidate)
+            except (ValueError, SyntaxError):
+                pass
+        raise ValueError("Error: _parse_llm_json - Could not parse the response as JSON.")
+
     # first part of pipeline
-    def generate_meditation_texts(self) -> List[str]:
+    def generate_meditation_texts(self, n_samples: int = 1) -> Union[List[str], List[List[str]]]:
         """
         Generates meditation text divided into subsections based on the given topic
         and stores in working directory.
 
-        :return: List of text subsections for the meditation.
+        :param n_samples: Number of different meditation texts to generate in one request.
+                          The last of them is the one kept.
+        :return: List of text subsections for the meditation, or a list of them for each
+                 text if n_samples is more than 1.
+        """
+        self._check_meditation_prompt()
+        # Generate the meditation text using OpenAI's LLM
+        full_text = self.send_prompt(self.prompt, use_json=True, n_samples=n_samples)
+        if n_samples > 1:
+            samples = [self._split_meditation_text(text) for text in full_text]
+            self.subsections = samples[-1]
+            return samples
+        self.subsections = self._split_meditation_text(full_text)
+        return self.subsections
+
+    def _check_meditation_prompt(self) -> None:
+        """
+        Checks that the meditation texts can be generated, raising an error if not.
         """
         # check self. working_directory exists
-        if not os.path.exists(self.working_directory):
-            msg = f"Error: generate_meditations_texts - working_directory does not exist: {self.working_directory}"
-            raise FileNotFoundError(msg)
+        self._assert_ready("generate_meditations_texts", check_topic=False)
         # check self.topic_based_filename exists
         if not self.topic_based_filename:
             raise ValueError("Error: topic_based_filename is not set.")
@@ -411,40 +825,46 @@ class MeditationVideoGenerator:
         if "json" not in self.prompt and "JSON" not in self.prompt:
             msg = "Error: generate_meditations_texts - JSON must be mentioned in a JSON prompt."
             raise ValueError(msg)
-        # Generate the meditation text using OpenAI's LLM
-        full_text = self.send_prompt(self.prompt, use_json=True)
-        full_text = full_text.replace("```json", "").replace("```", "")
+
+    def _split_meditation_text(self, full_text: str) -> List[str]:
+        """
+        Splits the LLM's JSON response for the meditation prompt into its subsections,
+        and stores the parts in the working directory.
+
+        :param full_text: Raw response to the meditation prompt.
+        :return: List of text subsections for the meditation.
+        """
         try:
-            full_json = json.loads(full_text)
+            full_json = self._parse_llm_json(full_text)
+            # JSON mode always returns an object, so the parts are wrapped in {"parts": [...]}
+            if isinstance(full_json, dict):
+                full_json = full_json["parts"]
             # Split the text into subsections
-            self.subsections = [value for d in full_json for key, value in d.items()]
+            subsections = [value for d in full_json for key, value in d.items()]
         except Exception as e:
-            try:
-                full_json = eval(full_text)
-                self.subsections = [value for d in full_json for key, value in d.items()]
-            except Exception as e:
-                # write it to a file for debugging
-                filename = os.path.join(self.working_directory,
-                                        f"{self.topic_based_filename}_raw_meditation_text_debug.json")
-                with open(filename, "w") as f:
-                    f.write(full_text)
-                msg = f"Error: generate_meditations_texts -  Could not parse the response from the API. Check the file {filename} for more information."
-                raise ValueError(msg) from e
+            # write it to a file for debugging
+            filename = os.path.join(self.working_directory,
+                                    f"{self.topic_based_filename}_raw_meditation_text_debug.json")
+            with open(filename, "w") as f:
+                f.write(full_text)
+            msg = f"Error: generate_meditations_texts -  Could not parse the response from the API. Check the file {filename} for more information."
+            raise ValueError(msg) from e
 
         # write to file
         filename = os.path.join(self.working_directory, f"{self.topic_based_filename}_meditation_text.json")
         with open(filename, "w") as f:
             json.dump(full_json, f, indent=4)
-        return self.subsections
+        return subsections
 
     # used by methods below
-    def synthesize_speech(self, text: str, filename: str, voice: str = "") -> None:
+    def _speech_cache_path(self, text: str, filename: str, voice: str) -> tuple[str, str, str]:
         """
-        Synthesizes speech from the given text and saves it as an MP3 file.
+        Checks the arguments of a speech synthesis and works out where its audio is cached.
 
         :param text: Text to be converted to speech.
         :param filename: Name of the output MP3 file.
-        :param voice: Voice to be used for the speech synthesis.
+        :param voice: Voice to be used for the speech synthesis (empty for the default voice).
+        :return: The voice and engine to use, and the path of the cached audio.
         """
         # check text not empty
         if text.strip() == "":
@@ -457,28 +877,111 @@ class MeditationVideoGenerator:
             raise ValueError("Error: synthesize_speech - Filename must end with .mp3.")
         if not voice:
             voice = self.voice
-
         if not self.elevenlabs_key:
+            engine = self.engine
+        else:
+            engine = self.elevenlabs_model
+        # the same text in the same voice always gives the same audio, so reuse a
+        # previous synthesis (e.g. from an earlier run on the same topic) if there is one
+        cache_key = hashlib.sha256(f"{engine}|{voice}|{text}".encode("utf-8")).hexdigest()
+        cache_path = os.path.join(self.tts_cache_dir, f"{cache_key}.mp3")
+        return voice, engine, cache_path
+
+    def synthesize_speech(self, text: str, filename: str, voice: str = "") -> None:
+        """
+        Synthesizes speech from the given text and saves it as an MP3 file.
+
+        :param text: Text to be converted to speech.
+        :param filename: Name of the output MP3 file.
+        :param voice: Voice to be used for the speech synthesis.
+        """
+        voice, engine, cache_path = self._speech_cache_path(text, filename, voice)
+        if not self.ignore_tts_cache and os.path.isfile(cache_path):
+            _link_or_copy(cache_path, filename)
+            return
+        os.makedirs(self.tts_cache_dir, exist_ok=True)
+        # synthesize to a temporary file and only move it into the cache once complete,
+        # so a failed or concurrent synthesis never leaves a truncated file in the cache
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.tts_cache_dir)
+        os.close(fd)
+        try:
+            if not self.elevenlabs_key:
+                try:
+                    # https://stackoverflow.com/questions/77952454/method-in-python-stream-to-file-not-working
+                    with self.client.audio.speech.with_streaming_response.create(
+                        model=engine,
+                        voice=voice,
+                        input=text
+                    ) as response:
+                        response.stream_to_file(tmp_path)
+                except Exception as e:
+                    msg = f"Error: synthesize_speech - OpenAI API call failed for the text: {text}"
+                    raise RuntimeError(msg) from e
+            else:
+                elevenlabs_audio = self.client11.generate(
+                    text=text,
+                    voice=voice,
+                    model=engine,
+                )
+                from elevenlabs import save
+                save(elevenlabs_audio, tmp_path)  # save the audio to a file use elevenlabs API
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+        # the audio is only written once, into the cache; filename just links to it
+        _link_or_copy(cache_path, filename)
+
+    async def _async_synthesize_speech(self, client, text: str, filename: str, voice: str = "") -> None:
+        """
+        Asynchronous version of synthesize_speech for OpenAI speech, sharing its cache.
+
+        :param client: AsyncOpenAI client to use.
+        :param text: Text to be converted to speech.
+        :param filename: Name of the output MP3 file.
+        :param voice: Voice to be used for the speech synthesis.
+        """
+        voice, engine, cache_path = self._speech_cache_path(text, filename, voice)
+        if not self.ignore_tts_cache and os.path.isfile(cache_path):
+            _link_or_copy(cache_path, filename)
+            return
+        os.makedirs(self.tts_cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.tts_cache_dir)
+        os.close(fd)
+        try:
             try:
-                # https://stackoverflow.com/questions/77952454/method-in-python-stream-to-file-not-working
-                with self.client.audio.speech.with_streaming_response.create(
-                    model=self.engine,
+                async with client.audio.speech.with_streaming_response.create(
+                    model=engine,
                     voice=voice,
                     input=text
                 ) as response:
-                    response.stream_to_file(filename)
+                    await response.stream_to_file(tmp_path)
             except Exception as e:
                 msg = f"Error: synthesize_speech - OpenAI API call failed for the text: {text}"
                 raise RuntimeError(msg) from e
-        else:
-            elevenlabs_audio = self.client11.generate(
-                text=text,
-                voice=voice,
-                model="eleven_multilingual_v2",
-            )
-            save(elevenlabs_audio, filename)  # save the audio to a file use elevenlabs API
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+        _link_or_copy(cache_path, filename)
 
+    async def _async_synthesize_all(self, jobs: list, on_done) -> None:
+        """
+        Synthesizes all the parts on one event loop, at most tts_max_workers at a time.
+
+        :param jobs: List of (index, text, filename, voice) tuples.
+        :param on_done: Called with each job once its file has been written.
+        """
+        semaphore = asyncio.Semaphore(self.tts_max_workers)
+        async with _async_openai(self.api_key) as client:
+            async def synthesize_part(job):
+                i, subsection, filename, voice = job
+                async with semaphore:
+                    print(f"Generating audio for part {i + 1} of {len(jobs)}...")
+                    await self._async_synthesize_speech(client, subsection, filename, voice=voice)
+                on_done(job)
 
+            await asyncio.gather(*(synthesize_part(job) for job in jobs))
 
     # second part of the pipeline
     def create_meditation_text_audio_files(self) -> List[str]:
@@ -493,12 +996,14 @@ class MeditationVideoGenerator:
             msg = "Error: create_meditation_text_audio_files - Subsections are not set."
             raise ValueError(msg)
         # check self.working_directory exists
-        if not os.path.exists(self.working_directory):
-            msg = f"Error: create_meditation_text_audio_files - working_directory does not exist: {self.working_directory}"
-            raise FileNotFoundError(msg)
+        self._assert_ready("create_meditation_text_audio_files", check_topic=False)
+        if self.tts_max_workers < 1:
+            msg = "Error: create_meditation_text_audio_files - tts_max_workers must be at least 1."
+            raise ValueError(msg)
+        # work out the file and voice for every part up front
+        jobs = []
         for i, subsection in enumerate(self.subsections):
             filename = os.path.join(self.working_directory, f"meditation_part_{i + 1}.mp3")
-            print(f"Generating audio for part {i + 1} of {len(self.subsections)}...")
             if self.two_voices:
                 # check self.voice_even exists
                 if not self.voice_even:
@@ -509,22 +1014,49 @@ class MeditationVideoGenerator:
                     msg = "Error: create_meditation_text_audio_files - voice_odd is not set."
                     raise ValueError(msg)
                 if i % 2 == 0:
-                    self.synthesize_speech(subsection, filename, voice=self.voice_even)
+                    voice = self.voice_even
                 else:
-                    self.synthesize_speech(subsection, filename, voice=self.voice_odd)
+                    voice = self.voice_odd
             else:
-                self.synthesize_speech(subsection, filename)
-            self.subsection_audio_files.append(filename)
+                voice = self.voice
+            jobs.append((i, subsection, filename, voice))
+        # each part is an independent network-bound request, so synthesize them
+        # concurrently. Files are stored by index so the list stays in meditation order.
+        self.subsection_audio_files = [""] * len(jobs)
+
+        def part_done(job):
+            i, _, filename, _ = job
+            self.subsection_audio_files[i] = filename
+
+        def synthesize_part(job):
+            i, subsection, filename, voice = job
+            print(f"Generating audio for part {i + 1} of {len(jobs)}...")
+            self.synthesize_speech(subsection, filename, voice=voice)
+            part_done(job)
+
+        # a client that was passed in is a synchronous one, so it is used from the thread pool
+        if not self.elevenlabs_key and not self._client_given and not _event_loop_running():
+            # OpenAI speech: all the requests are issued from one event loop
+            asyncio.run(self._async_synthesize_all(jobs, part_done))
+        else:
+            # ElevenLabs has no async client here, and asyncio.run can't be nested
+            # in a running loop, so fall back to a thread pool
+            with ThreadPoolExecutor(max_workers=min(self.tts_max_workers, len(jobs))) as executor:
+                # list() so that any exception raised in a worker is re-raised here
+                list(executor.map(synthesize_part, jobs))
         if self.num_loops:
             subsection_audio_files_orig = self.subsection_audio_files.copy()
-            # now copy the files num_loops times but update the filenames
+            # now duplicate the files num_loops times but update the filenames
             # so the index part fo the filename is unique and ordered
             # and update the self.subsection_audio_files
             base_index = len(subsection_audio_files_orig)
             for i in range(1, self.num_loops):  # num_loops 1 means no repeat
                 for j, file in enumerate(subsection_audio_files_orig):
-                    new_file = file.replace(f"meditation_part_{j + 1}", f"meditation_part_{base_index + j + 1}")
-                    shutil.copy(file, new_file)
+                    # build the name from the index rather than editing the source path
+                    new_file = os.path.join(self.working_directory, f"meditation_part_{base_index + j + 1}.mp3")
+                    # a duplicate left from an earlier run may already be the same file
+                    if not (os.path.exists(new_file) and os.path.samefile(file, new_file)):
+                        _link_or_copy(file, new_file)
                     self.subsection_audio_files.append(new_file)
                 base_index += len(subsection_audio_files_orig)
         return self.subsection_audio_files
@@ -536,29 +1068,27 @@ class MeditationVideoGenerator:
 
         :return: Path to the merged MP3 file.
         """
-        # check self.working_directory exists
-        if not os.path.exists(self.working_directory):
-            msg = f"Error: merge_meditation_audio - working_directory does not exist: {self.working_directory}"
-            raise FileNotFoundError(msg)
+        # check self.working_directory exists and self.topic_based_filename not empty
+        self._assert_ready("merge_meditation_audio")
         if not self.subsection_audio_files:
-            # get all files in working dir that start with meditation_part
-            self.subsection_audio_files = [os.path.join(self.working_directory, f) for f in
-                                           os.listdir(self.working_directory) if f.startswith("meditation_part")]
+            # get all the meditation_part_<n>.mp3 files in working dir, in increasing order of n
+            part_files = []
+            with os.scandir(self.working_directory) as entries:
+                for entry in entries:
+                    match = _PART_FILE_RE.fullmatch(entry.name)
+                    if match:
+                        part_files.append((int(match.group(1)), entry.path))
             # if empty list then return error
-            if not self.subsection_audio_files:
+            if not part_files:
                 msg = "Error: merge_meditation_audio - No files in list and none found to merge."
                 raise ValueError(msg)
-            # ensure sorted in increasing order
-            self.subsection_audio_files.sort(key=lambda x: int(x.split("_")[-1].split(".")[0]))
+            part_files.sort()
+            self.subsection_audio_files = [f for _, f in part_files]
         self.merger.mp3_files = self.subsection_audio_files
         # merger.spread_out_all_files()  # puts extra silence between phrases
         merged_file = self.merger.merge()
-        # check self.topic_based_filename not empty
-        if self.topic_based_filename.strip() == "":
-            msg = "Error: merge_meditation_audio - Empty topic_based_filename."
-            raise ValueError(msg)
         # write to file
-        filename = os.path.join(self.working_directory, f"{self.topic_based_filename}_meditation_text_merged.mp3")
+        filename = self._merged_path
         # rename merged file to filename
         shutil.move(merged_file, filename)
         return filename
@@ -571,35 +1101,79 @@ class MeditationVideoGenerator:
 
         :return: Path to the output audio file with effects applied.
         """
-        # check self.working_directory exists
-        if not os.path.exists(self.working_directory):
-            msg = f"Error: add_audio_fx - working_directory does not exist: {self.working_directory}"
-            raise FileNotFoundError(msg)
-        # check self.topic_based_filename not empty
-        if self.topic_based_filename.strip() == "":
-            msg = "Error: add_audio_fx - Empty topic_based_filename."
-            raise ValueError(msg)
+        # check self.working_directory exists and self.topic_based_filename not empty
+        self._assert_ready("add_audio_fx")
+        filename = self._merged_path
+        output_filename = self._merged_fx_path
         # check a file ending _meditation_text_merged.mp3 exists in working dir
-        if not os.path.exists(
-                os.path.join(self.working_directory, f"{self.topic_based_filename}_meditation_text_merged.mp3")):
+        if not os.path.isfile(filename):
             msg = f"Error: add_audio_fx - File {self.topic_based_filename}_meditation_text_merged.mp3 does not exist in working directory."
             raise FileNotFoundError(msg)
-        filename = os.path.join(self.working_directory,
-                                f"{self.topic_based_filename}_meditation_text_merged.mp3")
-        # Load the MP3 file
-        with AudioFile(filename) as f:
-            audio = f.read(f.frames)
-            sample_rate = f.samplerate
+        if self.use_ffmpeg_fx and self._add_audio_fx_ffmpeg(filename, output_filename):
+            return output_filename
+        from pedalboard import Pedalboard
+        from pedalboard.io import AudioFile
         # Create a Pedalboard with desired effects
         board = Pedalboard(self.pedalboard_fx_list)
-        # Apply the effects
-        effected = board(audio, sample_rate)
-        filename = os.path.join(self.working_directory,
-                                f"{self.topic_based_filename}_meditation_text_merged_fx.mp3")
-        # Write the effected audio to a new file
-        with AudioFile(filename, 'w', sample_rate, effected.shape[0]) as f:
-            f.write(effected)
-        return filename
+        board.reset()  # the plugins may hold state from a previous run
+        # Stream the audio through the effects a block at a time rather than loading the
+        # whole meditation into memory. reset=False carries the filter and reverb state
+        # over from one block to the next, so the output matches a single full-length pass.
+        with AudioFile(filename) as f_in:
+            with AudioFile(output_filename, 'w', f_in.samplerate, f_in.num_channels) as f_out:
+                while f_in.tell() < f_in.frames:
+                    # the plugins work on C-contiguous float32; AudioFile.read may hand back
+                    # float64 on some builds, which would otherwise be converted silently
+                    # (and copied) on the way into every effect
+                    chunk = np.ascontiguousarray(f_in.read(self.fx_block_size), dtype=np.float32)
+                    f_out.write(board(chunk, f_in.samplerate, buffer_size=8192, reset=False))
+        return output_filename
+
+    def _ffmpeg_fx_filter(self) -> str:
+        """
+        Translates self.pedalboard_fx_list into an equivalent ffmpeg audio filter chain.
+
+        :return: The filter string, or "" if the list contains a plugin with no ffmpeg equivalent.
+        """
+        from pedalboard import LowShelfFilter, LowpassFilter, Reverb, Gain
+        filters = []
+        for fx in self.pedalboard_fx_list:
+            if isinstance(fx, LowShelfFilter):
+                filters.append(f"bass=g={fx.gain_db:g}:f={fx.cutoff_frequency_hz:g}:width_type=q:w={fx.q:g}")
+            elif isinstance(fx, LowpassFilter):
+                filters.append(f"lowpass=f={fx.cutoff_frequency_hz:g}")
+            elif isinstance(fx, Reverb):
+                # ffmpeg has no room reverb; a single short echo at the wet level is close
+                # for the small, dry rooms used here
+                delay = 20 + 100 * fx.room_size
+                filters.append(f"aecho=1.0:1.0:{delay:.0f}:{fx.wet_level:.3g}")
+            elif isinstance(fx, Gain):
+                filters.append(f"volume={fx.gain_db:g}dB")
+            else:
+                return ""
+        return ",".join(filters)
+
+    def _add_audio_fx_ffmpeg(self, filename: str, output_filename: str) -> bool:
+        """
+        Applies the audio effects with a single ffmpeg pass.
+
+        :param filename: Path to the input MP3 file.
+        :param output_filename: Path to the output MP3 file.
+        :return: True if ffmpeg produced the output, False if Pedalboard should be used instead.
+        """
+        ffmpeg = shutil.which("ffmpeg")
+        if not ffmpeg:
+            return False
+        fx_filter = self._ffmpeg_fx_filter()
+        if not fx_filter:
+            return False
+        result = subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-i", filename, "-af", fx_filter,
+                                 "-c:a", "libmp3lame", "-q:a", "2", output_filename],
+                                capture_output=True)
+        if result.returncode != 0:
+            print(f"WARNING: ffmpeg audio effects failed, using Pedalboard instead: {result.stderr.decode(errors='replace')}")
+            return False
+        return True
 
     # fifth part of the pipeline
     # generate binaural beats using MP3Mixer and merge with the merged_file
@@ -610,62 +1184,81 @@ class MeditationVideoGenerator:
         :param merged_file: Path to the merged MP3 file.
         :return: Path to the mixed MP3 file.
         """
-        # check self.working_directory exists
-        if not os.path.exists(self.working_directory):
-            msg = f"Error: mix_meditation_audio - working_directory does not exist: {self.working_directory}"
-            raise FileNotFoundError(msg)
-        # check self.topic_based_filename not empty
-        if self.topic_based_filename.strip() == "":
-            msg = "Error: mix_meditation_audio - Empty topic_based_filename."
-            raise ValueError(msg)
+        # check self.working_directory exists and self.topic_based_filename not empty
+        self._assert_ready("mix_meditation_audio")
+        merged_file = self._merged_fx_path
         # check a file ending _meditation_text_merged_fx.mp3 exists in working dir
-        if not os.path.exists(
-                os.path.join(self.working_directory, f"{self.topic_based_filename}_meditation_text_merged_fx.mp3")):
+        if not os.path.isfile(merged_file):
             msg = f"Error: add_audio_fx - File {self.topic_based_filename}_meditation_text_merged_fx.mp3 does not exist in working directory."
             raise FileNotFoundError(msg)
-        merged_file = os.path.join(self.working_directory,
-                                   f"{self.topic_based_filename}_meditation_text_merged_fx.mp3")
         self.mixer.mp3_file = merged_file
         mixed_file = self.mixer.mix_audio()
         base_filename = f"{self.topic_based_filename}_meditation_text_merged_fx_mixed.mp3"
-        filename = os.path.join(self.working_directory, base_filename)
+        filename = self._mixed_path
         # rename mixed file to filename
-        os.rename(mixed_file, filename)
+        os.replace(mixed_file, filename)
         # copy to base_filename as well
         # so that video and mp3 are in the top level directory in case user wants to upload
-        # the mp3 to spotify or something.
-        shutil.copy(filename, base_filename)
+        # the mp3 to spotify or something. A hardlink shares the data without copying it
+        # and, unlike a symlink, survives the workspace being deleted.
+        if os.path.lexists(base_filename):
+            os.remove(base_filename)
+        try:
+            os.link(filename, base_filename)
+        except OSError:
+            shutil.copy(filename, base_filename)
         return filename
 
+    @staticmethod
+    def _system_font_path() -> str:
+        """
+        :return: The path of the banner font for this OS.
+        """
+        # if not macOS, Windows or Linux, raise error
+        if not _SYSTEM_FONT_PATH:
+            msg = "Error: add_banner_with_text - Unsupported OS (only supports Darwin, Windows, Linux). Or this package is detecting your OS incorrectly."
+            raise OSError(msg)
+        return _SYSTEM_FONT_PATH
+
     # this function keeps increasing the font size until it fills in the desired area
     def find_optimal_font_size_and_wrap(self, text, max_width, max_height, font_path):
-        font_size = 1
-        lines = []
-        while True:
+        def wrap_at(font_size):
             # if raises error then assume font_path is not valid
             try:
-                font = ImageFont.truetype(font_path, font_size)
+                font = _load_font(font_path, font_size)
             except OSError:
                 msg = f"Error: find_optimal_font_size_and_wrap - Invalid font path: {font_path}"
                 msg += "This is probably because the OS front path has been incorrectly detected by this package."
                 raise OSError(msg)
             # Estimate the number of characters per line
             # this gives the width in pixels of letter X (its actually the right hand side x coord)
-            avg_char_width = font.getbbox('X')[2]
-            # (getbox returns a tuple of 4 values, x1, y1, x2, y2)
+            # and the height of a capital letter
+            avg_char_width, line_height = _x_metrics(font_path, font_size)
             # divided total box width available by X width in pixels to get max chars per line
             max_chars_per_line = max(1, int(max_width / avg_char_width))
             # Wrap text to avoid going over max chars per line
             wrapped_lines = textwrap.wrap(text, width=max_chars_per_line)
             # Calculate total height
-            line_height = font.getbbox('X')[3]  # Use 'X' to get the height of a capital letter
             total_height = line_height * len(wrapped_lines)
-            if total_height > max_height * 0.8:  # Reduce to 80% of max height to leave more space at the bottom
-                font_size -= 1
-                font = ImageFont.truetype(font_path, font_size)
-                break
-            font_size += 1  # try a larger font
-            lines = wrapped_lines
+            # Reduce to 80% of max height to leave more space at the bottom
+            return font, wrapped_lines, total_height <= max_height * 0.8
+
+        # the wrapped text only gets taller as the font grows, so binary search for
+        # the largest font size that still fits (a capital X is at least half the
+        # font size tall, so nothing above 2 * max_height can fit)
+        font, lines = None, []
+        low, high = 1, max(1, int(2 * max_height))
+        while low <= high:
+            font_size = (low + high) // 2
+            size_font, wrapped_lines, fits = wrap_at(font_size)
+            if fits:
+                font, lines = size_font, wrapped_lines
+                low = font_size + 1  # try a larger font
+            else:
+                high = font_size - 1
+        if font is None:
+            # not even the smallest font fits, so there is no text to draw
+            font = wrap_at(1)[0]
         return font, lines
 
     def add_banner_with_text(self, image_path: str, banner_text: str,
@@ -678,12 +1271,15 @@ class MeditationVideoGenerator:
         :param output_path: Path to save the output image.
         """
         # check for valid image path
-        if not os.path.exists(image_path):
+        if not os.path.isfile(image_path):
             msg = f"Error: add_banner_with_text - Image file does not exist: {image_path}"
             raise FileNotFoundError(msg)
         # if it fails to load image now, assume that is not a valid image file
+        # (Image.open is lazy, so load the pixels inside the with-block, which then closes
+        # the file straight away)
         try:
-            image = Image.open(image_path)
+            with Image.open(image_path) as source:
+                image = source.convert("RGB")
         except Exception as e:
             msg = f"Error: add_banner_with_text - Failed to load image file: {image_path}"
             msg += f"\nUnderlying error: {str(e)}"
@@ -717,9 +1313,7 @@ class MeditationVideoGenerator:
             msg = f"Error: add_banner_with_text - Banner width too small: {banner_width}"
             msg += f"\nCheck image width: {width}"
             raise ValueError(msg)
-        # Create a drawing context
-        draw = ImageDraw.Draw(image, "RGBA")  # Use RGBA to support transparency
-        background_colour = tuple(BLUE + [int(self.opacity * 255)])
+        alpha = int(self.opacity * 255)
         # Define the banner area (black rectangle with gaps around it)
         if self.banner_at_bottom:
             # coordinates are:
@@ -733,25 +1327,23 @@ class MeditationVideoGenerator:
             msg = f"Error: add_banner_with_text - Invalid banner area: {banner_area}"
             msg += f"\nCheck image dimensions: {width} x {height} and banner height ratio: {self.banner_height_ratio}"
             raise ValueError(msg)
-        draw.rectangle(banner_area, fill=background_colour)
-        # check if macOS, Windows or Linux
-        if platform.system() == "Darwin":
-            font_path = "/Library/Fonts/Arial.ttf"
-        elif platform.system() == "Windows":
-            font_path = "C:/Windows/Fonts/Arial.ttf"
-        elif platform.system() == "Linux":
-            font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
-        # if not macOS, Windows or Linux, use default font path raise error
-        else:
-            msg = "Error: add_banner_with_text - Unsupported OS (only supports Darwin, Windows, Linux). Or this package is detecting your OS incorrectly."
-            raise OSError(msg)
-        #font_path = "/Library/Fonts/Arial.ttf"  # macOS example
-        # font_path = "C:/Windows/Fonts/Arial.ttf"  # Windows example
-        # font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"  # Linux example
+        # blend the banner colour into just the banner slice of the image
+        # (the corners are inclusive, as for draw.rectangle)
+        (x0, y0), (x1, y1) = banner_area
+        pixels = np.array(image)
+        banner = pixels[y0:y1 + 1, x0:x1 + 1].astype(np.uint32)
+        blended = banner * (255 - alpha) + np.array(BLUE, dtype=np.uint32) * alpha
+        # divide by 255 with rounding, exactly as Pillow blends a translucent fill
+        blended += 128
+        pixels[y0:y1 + 1, x0:x1 + 1] = (blended + (blended >> 8)) >> 8
+        image = Image.fromarray(pixels)
+        # Create a drawing context
+        draw = ImageDraw.Draw(image, "RGBA")  # Use RGBA to support transparency
+        font_path = self._system_font_path()
         # Find optimal font size and wrap text
         font, lines = self.find_optimal_font_size_and_wrap(text, banner_width, banner_height, font_path)
         # Calculate total text height
-        line_height = font.getbbox('X')[3]  # finds the height of a capital letter X pixels
+        line_height = _x_metrics(font.path, font.size)[1]  # finds the height of a capital letter X pixels
         total_text_height = line_height * len(lines)
         if self.banner_at_bottom:
             y_position = height - banner_height - gap_size + (banner_height - total_text_height) * 0.4
@@ -763,19 +1355,16 @@ class MeditationVideoGenerator:
             msg = f"Error: add_banner_with_text - Invalid y_position: {y_position}"
             msg += f"\nCheck banner_height_ratio: {self.banner_height_ratio} and image height: {height}"
             raise ValueError(msg)
-        # Add each line of text to the banner
-        for line in lines:
-            text_width = font.getbbox(line)[2]
-            # the start point is: move right past the gap, then move the distance between
-            # the edge of the banner and the start of the text.
-            # banner_width - text_width is the space either side of the text
-            # not including the gapsize between the banner edge and the image edge
-            x_position = gap_size + (banner_width - text_width) / 2
-            # draw object is pointing to the loaded image
-            draw.text((x_position, y_position), line, fill=YELLOW, font=font)
-            y_position += line_height # not line height is not the height of X but the height of bounding box of X
+        # Add all the lines of text to the banner in one call. anchor "ma" centres each line
+        # horizontally on the banner's midpoint, with its ascender at y_position
+        # the spacing tops Pillow's own line advance (the height of "A") up to line_height,
+        # the height of the bounding box of X
+        spacing = line_height - font.getbbox("A")[3]
+        # draw object is pointing to the loaded image
+        draw.multiline_text((gap_size + banner_width / 2, y_position), "\n".join(lines), fill=YELLOW,
+                            font=font, anchor="ma", spacing=spacing, align="center")
         # check for valid output path
-        if not os.path.exists(os.path.dirname(output_path)):
+        if not os.path.isdir(os.path.dirname(output_path)):
             msg = f"Error: add_banner_with_text - Output directory does not exist: {output_path}"
             raise FileNotFoundError(msg)
         # Save the image
@@ -804,14 +1393,8 @@ class MeditationVideoGenerator:
         if self.image_quality.strip() == "":
             msg = "Error: generate_meditation_image - Empty image_quality."
             raise ValueError(msg)
-        # check self.working_directory exists
-        if not os.path.exists(self.working_directory):
-            msg = f"Error: generate_meditation_image - working_directory does not exist: {self.working_directory}"
-            raise FileNotFoundError(msg)
-        # check self.topic_based_filename not empty
-        if self.topic_based_filename.strip() == "":
-            msg = "Error: generate_meditation_image - Empty topic_based_filename."
-            raise ValueError(msg)
+        # check self.working_directory exists and self.topic_based_filename not empty
+        self._assert_ready("generate_meditation_image")
         # 1920x1080 is the resolution of the video
         try:
             response = self.client.images.generate(
@@ -825,25 +1408,53 @@ class MeditationVideoGenerator:
             msg = f"Error: generate_meditation_image - OpenAI API call failed: {str(e)}"
             raise RuntimeError(msg) from e
         image_url = response.data[0].url
-        # use requests to get image
-        response = requests.get(image_url)
-        # save the image
+        # use requests to get image, streaming it straight to disk
         image_path = os.path.join(self.working_directory,
                                   f"{self.topic_based_filename}_meditation_image_no_banner.jpg")
-        with open(image_path, "wb") as f:
-            f.write(response.content)
+        try:
+            with _shared_http_session().get(image_url, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                # save the image
+                with open(image_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+        except requests.RequestException as e:
+            msg = f"Error: generate_meditation_image - Image download failed: {str(e)}"
+            raise RuntimeError(msg) from e
         # add banner
 
         if len(self.topic.split()) > self.max_banner_words:
-            prompt = f"Give me a less than {self.max_banner_words} word summary of the following topic: {self.topic}"
-            response = self.send_prompt(prompt)
+            response = self._banner_summary()
         else:
             response = self.topic
-        output_image_path = os.path.join(self.working_directory,
-                                  f"{self.topic_based_filename}_meditation_image.jpg")
-        image_path = self.add_banner_with_text(image_path, response, output_image_path)
+        image_path = self.add_banner_with_text(image_path, response, self._image_path)
         return image_path
 
+    def _banner_summary(self) -> str:
+        """
+        Asks the LLM for a summary of the topic short enough for the banner, reusing the
+        summary from an earlier run on the same topic if there is one.
+
+        :return: The banner text.
+        """
+        prompt = f"Give me a less than {self.max_banner_words} word summary of the following topic: {self.topic}"
+        cache_key = hashlib.sha256(f"{self.model}|{prompt}".encode("utf-8")).hexdigest()
+        cache_path = os.path.join(self.summary_cache_dir, f"{cache_key}.txt")
+        if not self.ignore_summary_cache and os.path.isfile(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return f.read()
+        response = self.send_prompt(prompt)
+        # write to a temporary file first so a concurrent run never reads half a summary
+        try:
+            os.makedirs(self.summary_cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.summary_cache_dir)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(response)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass  # the cache is only an optimisation
+        return response
+
     # generate an mp4 which consists of an audio file combined with an image file
     def create_meditation_video(self) -> str:
         """
@@ -851,42 +1462,80 @@ class MeditationVideoGenerator:
 
         :return: Path to the output video file.
         """
-        # check self.working_directory exists
-        if not os.path.exists(self.working_directory):
-            msg = f"Error: create_meditation_video - working_directory does not exist: {self.working_directory}"
-            raise FileNotFoundError(msg)
-        # check self.topic_based_filename not empty
-        if self.topic_based_filename.strip() == "":
-            msg = "Error: create_meditation_video - Empty topic_based_filename."
-            raise ValueError(msg)
+        # check self.working_directory exists and self.topic_based_filename not empty
+        self._assert_ready("create_meditation_video")
         # check image file exists
-        if not os.path.exists(os.path.join(self.working_directory,
-                                            f"{self.topic_based_filename}_meditation_image.jpg")):
+        image_filename = self._image_path
+        if not os.path.isfile(image_filename):
                 msg = f"Error: create_meditation_video - Image file {self.topic_based_filename}_meditation_image.jpg does not exist."
                 raise FileNotFoundError(msg)
-        #Load the image and create a clip
-        image_clip = ImageClip(os.path.join(self.working_directory,
-                                            f"{self.topic_based_filename}_meditation_image.jpg"))
         # check audio file exists
-        if not os.path.exists(os.path.join(self.working_directory,
-                                            f"{self.topic_based_filename}_meditation_text_merged_fx_mixed.mp3")):
+        audio_filename = self._mixed_path
+        if not os.path.isfile(audio_filename):
                 msg = f"Error: create_meditation_video - Audio file {self.topic_based_filename}_meditation_text_merged_fx_mixed.mp3 does not exist."
                 raise FileNotFoundError(msg)
+        # Set the output path
+        output_path = f"{self.topic_based_filename}_meditation_video.mp4"
+        from moviepy.config import get_setting
+        ffmpeg_binary = get_setting("FFMPEG_BINARY")
+        if self._mux_still_video(ffmpeg_binary, image_filename, audio_filename, output_path):
+            return output_path
+        from moviepy.editor import ImageClip, AudioFileClip
+        #Load the image and create a clip
+        image_clip = ImageClip(image_filename)
         # Load the audio file
-        audio_filename = os.path.join(self.working_directory,
-                                      f"{self.topic_based_filename}_meditation_text_merged_fx_mixed.mp3")
         audio_clip = AudioFileClip(audio_filename)
         # Set the duration of the image clip to match the audio duration
         image_clip = image_clip.set_duration(audio_clip.duration)
         # Set the audio of the clip
         video_clip = image_clip.set_audio(audio_clip)
-        # Set the output path
-        output_path = f"{self.topic_based_filename}_meditation_video.mp4"
-        # Write the result to a file
-        video_clip.write_videofile(output_path, fps=24, threads=32)
+        # Write the result to a file. The video is one still image, so tell x264 so,
+        # or use the GPU encoder when there is one.
+        if _has_nvenc(ffmpeg_binary):
+            video_clip.write_videofile(output_path, fps=24, codec="h264_nvenc", preset="p4",
+                                       ffmpeg_params=["-pix_fmt", "yuv420p"], threads=8, audio_codec="aac")
+        else:
+            video_clip.write_videofile(output_path, fps=24, codec="libx264", preset="veryfast",
+                                       ffmpeg_params=["-tune", "stillimage"], threads=8, audio_codec="aac")
         # copy audio file to output directory
         return output_path
 
+    @staticmethod
+    def _mux_still_video(ffmpeg_binary: str, image_filename: str, audio_filename: str, output_path: str) -> bool:
+        """
+        Makes the video straight from the image and the audio with one ffmpeg call.
+        ffmpeg loops the single image itself, so no frames go through Python, and
+        the MP3 audio is copied into the MP4 without re-encoding.
+
+        :param ffmpeg_binary: The ffmpeg executable.
+        :param image_filename: Path to the video image.
+        :param audio_filename: Path to the MP3 audio.
+        :param output_path: Path of the MP4 to write.
+        :return: True if the video was written, False if moviepy should render it instead.
+        """
+        if _has_nvenc(ffmpeg_binary):
+            video_codec = ["-c:v", "h264_nvenc", "-preset", "p4"]
+        else:
+            video_codec = ["-c:v", "libx264", "-preset", "veryfast", "-tune", "stillimage"]
+        command = [ffmpeg_binary, "-y", "-hide_banner", "-loglevel", "error",
+                   # read the image once a second and repeat it up to 24 fps after scaling,
+                   # rather than decoding and scaling the JPEG for every frame
+                   "-loop", "1", "-framerate", "1", "-i", image_filename,
+                   "-i", audio_filename,
+                   # H.264 in yuv420p needs even dimensions
+                   "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2,fps=24", "-pix_fmt", "yuv420p",
+                   *video_codec,
+                   "-c:a", "copy", "-shortest", output_path]
+        try:
+            result = subprocess.run(command, capture_output=True)
+        except OSError as e:
+            print(f"WARNING: could not run ffmpeg, rendering the video with moviepy instead: {e}")
+            return False
+        if result.returncode != 0:
+            print(f"WARNING: ffmpeg video mux failed, rendering the video with moviepy instead: {result.stderr.decode(errors='replace')}")
+            return False
+        return True
+
     def run_meditation_pipeline(self, content: str = "") -> tuple[list[str], str]:
         """
         Generates a full meditation experience including text, audio, and video.
@@ -919,56 +1568,97 @@ class MeditationVideoGenerator:
                 msg = "Error: run_meditation_pipeline - Empty free_text list."
                 raise ValueError(msg)
             self.subsections = free_text  # this is what would've been generated
-        # generate the audio
-        if self.pipeline.get("audio_files"):
-            print("Generating meditation audio sub-files...")
-            self.create_meditation_text_audio_files()
-        else:
-            print("Skipping generating meditation audio sub-files...")
-        if self.pipeline.get("combine_audio_files"):
-            # merge the audio
-            print("Combining audio files with silences...")
-            self.merge_meditation_audio()
-        else:
-            print("Skipping combining audio files...")
-        if self.pipeline.get("audio_fx"):
-            print("Adding audio effects...")
-            self.add_audio_fx()
-        else:
-            print("Skipping audio effects...")
-        if self.pipeline.get("background_audio"):
-            # mix the audio
-            print("Adding background sounds/music to spoken audio...")
-            self.mix_meditation_audio()
-        else:
-            print("Skipping adding background sounds/music to spoken audio...")
+        # the image and the keywords do not depend on the audio, so they are made in
+        # the background while the audio stages run. The image is waited for before
+        # the video is created, the keywords at the end.
+        background = ThreadPoolExecutor(max_workers=2)
+        image_future = None
+        keywords_future = None
         if self.pipeline.get("image"):
             # generate the image
-            print("Generating meditation image for video...")
-            self.generate_meditation_image()
+            print("Generating meditation image for video (in the background)...")
+            image_future = background.submit(self.generate_meditation_image)
         else:
             print("Skipping image generation image for video...")
-        if self.pipeline.get("video"):
-            # generate the video
-            print("Creating meditation video...")
-            filename = self.create_meditation_video()
-        else:
-            print("Skipping video generation...")
-            filename = "Video generation skipped by user choice."
         if self.pipeline.get("keywords"):
-            kw, kw_str = self.generate_keywords()
+            print("Generating keywords (in the background)...")
+            keywords_future = background.submit(self._keywords_stage)
+
+        def check_image():
+            # stop before the next (possibly paid) stage if the image has already failed,
+            # e.g. when the prompt was rejected by the content filter
+            if image_future is not None and image_future.done() and image_future.exception():
+                raise image_future.exception()
+
+        try:
+            # generate the audio
+            if self.pipeline.get("audio_files"):
+                print("Generating meditation audio sub-files...")
+                check_image()
+                self.create_meditation_text_audio_files()
+            else:
+                print("Skipping generating meditation audio sub-files...")
+            if self.pipeline.get("combine_audio_files"):
+                # merge the audio
+                print("Combining audio files with silences...")
+                check_image()
+                self.merge_meditation_audio()
+            else:
+                print("Skipping combining audio files...")
+            if self.pipeline.get("audio_fx"):
+                print("Adding audio effects...")
+                check_image()
+                self.add_audio_fx()
+            else:
+                print("Skipping audio effects...")
+            if self.pipeline.get("background_audio"):
+                # mix the audio
+                print("Adding background sounds/music to spoken audio...")
+                check_image()
+                self.mix_meditation_audio()
+            else:
+                print("Skipping adding background sounds/music to spoken audio...")
+            if image_future is not None:
+                image_future.result()  # re-raises any error from the image generation
+            if self.pipeline.get("video"):
+                # generate the video
+                print("Creating meditation video...")
+                filename = self.create_meditation_video()
+            else:
+                print("Skipping video generation...")
+                filename = "Video generation skipped by user choice."
+        except BaseException:
+            # don't hold the error back until the image download or the keywords finish
+            background.shutdown(wait=False, cancel_futures=True)
+            raise
+        # wait for whatever is still running in the background
+        background.shutdown(wait=True)
+        if keywords_future is not None:
+            _, kw_str, topic_translation = keywords_future.result()
             print(f"Suggested Keywords: \n{kw_str}")
             if self.in_spanish:
-                # check self.topic is not empty
-                if self.topic.strip() == "":
-                    msg = "Error: run_meditation_pipeline - Empty topic."
-                    raise ValueError(msg)
-                print(f"Topic in Spanish: \n{self.translate_text(self.topic)}")
+                print(f"Topic in Spanish: \n{topic_translation}")
         else:
             print("Skipping keyword generation...")
-            kw, kw_str = [], ""
         return self.subsections, filename
 
+    def _keywords_stage(self) -> tuple[list[str], str, str]:
+        """
+        The keywords stage of run_meditation_pipeline: the keywords and, for Spanish
+        meditations, the translated topic.
+
+        :return: The keywords, the keywords as a string and the translated topic ("" if not in Spanish).
+        """
+        kw, kw_str = self.generate_keywords()
+        topic_translation = ""
+        if self.in_spanish:
+            # check self.topic is not empty
+            if self.topic.strip() == "":
+                msg = "Error: run_meditation_pipeline - Empty topic."
+                raise ValueError(msg)
+            topic_translation = self.translate_text(self.topic)
+        return kw, kw_str, topic_translation
+
     def generate_keywords(self, num_keywords: int = 30):
         """
         Generate keywords for the topic.
@@ -993,9 +1683,11 @@ class MeditationVideoGenerator:
         print(f"Generating keywords for the topic '{self.topic}'...")
         keywords_str = self.send_prompt(keywords_prompt)
         try:
-            keywords = [k.lower().strip() for k in keywords_str.split(",")]
+            # lowercase the whole response once, and drop the empty entries left by a
+            # trailing or doubled comma
+            keywords = [k for k in (s.strip() for s in keywords_str.lower().split(",")) if k]
             if self.in_spanish:
-                keywords = [self.translate_text(k) for k in keywords]
+                keywords = self.translate_keywords(keywords)
                 keywords_str = ", ".join(keywords)
         except Exception as e:
             msg = f"Error parsing OpenAI API response for keywords. See file 'keywords_raw_response.txt'.\n{e}"
@@ -1013,6 +1705,20 @@ class MeditationVideoGenerator:
         :param target_language: The target language to translate to.
         :return: The translated text.
         """
+        translation_prompt = self._translation_prompt(text, target_language)
+        print(f"Translating text to {target_language}...")
+        translated_text = self.send_prompt(translation_prompt)
+        return translated_text
+
+    @staticmethod
+    def _translation_prompt(text: str, target_language: str) -> str:
+        """
+        Checks the arguments of a translation and builds its prompt.
+
+        :param text: The text to translate.
+        :param target_language: The target language to translate to.
+        :return: The translation prompt.
+        """
         # check text is a non-empty string
         if not isinstance(text, str) or text.strip() == "":
             msg = "Error: translate_text - text must be a non-empty string."
@@ -1022,30 +1728,98 @@ class MeditationVideoGenerator:
             msg = "Error: translate_text - target_language must be a non-empty string."
             raise ValueError(msg)
         # Translate the text to the target language
-        translation_prompt = f"""
+        return f"""
         Act as a professional translator who is an expert in translating text to different languages.
         You are tasked with translating the below TEXT to {target_language}:
         <TEXT>'{text}'</TEXT>
         Respond only with the translated text, with no prefix or suffix to your response.
         """
-        print(f"Translating text to {target_language}...")
-        translated_text = self.send_prompt(translation_prompt)
-        return translated_text
+
+    async def _async_translate_texts(self, texts: List[str], target_language: str) -> List[str]:
+        """
+        Translates several texts concurrently on one event loop, at most 16 requests at a time.
+
+        :param texts: The texts to translate.
+        :param target_language: The target language to translate to.
+        :return: The translated texts, in the same order.
+        """
+        prompts = [self._translation_prompt(text, target_language) for text in texts]
+        semaphore = asyncio.Semaphore(16)  # stay well inside the rate limits
+        async with _async_openai(self.api_key) as client:
+            async def translate(prompt):
+                async with semaphore:
+                    response = await client.chat.completions.create(
+                        model=self.model,
+                        messages=[{"role": "user", "content": prompt}]
+                    )
+                return response.choices[0].message.content
+
+            return list(await asyncio.gather(*(translate(prompt) for prompt in prompts)))
+
+    def translate_keywords(self, keywords: List[str], target_language: str = "Spanish") -> List[str]:
+        """
+        Translate a list of keywords to a target language in a single request.
+        If the model does not return one translation per keyword, the keywords
+        are translated individually instead (concurrently).
+
+        :param keywords: The keywords to translate.
+        :param target_language: The target language to translate to.
+        :return: The translated keywords, in the same order.
+        """
+        # check target_language is a non-empty string
+        if not isinstance(target_language, str) or target_language.strip() == "":
+            msg = "Error: translate_keywords - target_language must be a non-empty string."
+            raise ValueError(msg)
+        keywords = [k for k in keywords if k.strip()]
+        if not keywords:
+            return []
+        translation_prompt = f"""
+        Act as a professional translator who is an expert in translating text to different languages.
+        Translate each of the following comma-separated terms to {target_language}, preserving their order:
+        <TERMS>{", ".join(keywords)}</TERMS>
+        Respond only with the translated terms as a comma-separated list, with no prefix or suffix to your response.
+        """
+        print(f"Translating {len(keywords)} keywords to {target_language}...")
+        translated = [t.strip() for t in self.send_prompt(translation_prompt).split(",")]
+        if len(translated) == len(keywords) and all(translated):
+            return translated
+        print("WARNING: batch translation did not match the keywords, translating them one by one.")
+        # the keywords are independent, so translate them all at once (through a client
+        # that was passed in if there is one, in a thread pool as it is not an async client)
+        if not self._client_given and not _event_loop_running():
+            return asyncio.run(self._async_translate_texts(keywords, target_language))
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            return list(executor.map(lambda k: self.translate_text(k, target_language), keywords))
 
     def delete_meditation_workspace(self):
         """
         Delete the meditation workspace - i.e. the directory and its contents.
         """
         if os.path.exists(self.working_directory):
-            # remove files in dir first
-            for file in os.listdir(self.working_directory):
-                file_path = os.path.join(self.working_directory, file)
-                try:
-                    if os.path.isfile(file_path):
-                        os.unlink(file_path)
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path)
-                except Exception as e:
-                    print(f"Error deleting file: {e}")
-            shutil.rmtree(self.working_directory)
-            print(f"Deleted meditation workspace at '{self.working_directory}'.")
+            # the paths that could not be deleted, with why, so the workspace is only
+            # reported as deleted if everything went
+            failures = []
+            if self._owns_working_directory:
+                # rmtree removes the contents too; problem files are skipped and reported below
+                # (onerror is deprecated from Python 3.12 in favour of onexc)
+                if sys.version_info >= (3, 12):
+                    shutil.rmtree(self.working_directory,
+                                  onexc=lambda function, path, exc: failures.append((path, exc)))
+                else:
+                    shutil.rmtree(self.working_directory,
+                                  onerror=lambda function, path, exc_info: failures.append((path, exc_info[1])))
+            else:
+                # a working_directory that was passed in is kept, with only this class's files removed
+                for path in self._working_files():
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        failures.append((path, e))
+            self._ready_directory = ""
+            for path, e in failures:
+                print(f"Error deleting file: {e}")
+            if failures:
+                print(f"Could not delete all of the meditation workspace at '{self.working_directory}' "
+                      f"({len(failures)} entries were left).")
+            else:
+                print(f"Deleted meditation workspace at '{self.working_directory}'.")
@@ -1,8 +1,168 @@
 import os
 from pydub import AudioSegment
+from pydub.utils import db_to_float, ratio_to_db
 from typing import List
-from pydub.silence import split_on_silence
-import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+
+# numpy types of pydub's signed sample widths
+_SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def _all_files_exist(files: List[str]) -> bool:
+    """
+    Checks that every file exists, listing each directory once with os.scandir
+    rather than making a stat call per file.
+
+    :param files: Paths of the files.
+    :return: True if they all exist (and are files rather than directories).
+    """
+    names_by_dir = {}
+    for file in files:
+        names_by_dir.setdefault(os.path.dirname(file), set()).add(os.path.basename(file))
+    for directory, names in names_by_dir.items():
+        try:
+            with os.scandir(directory or ".") as entries:
+                found = {entry.name for entry in entries if entry.name in names and entry.is_file()}
+        except OSError:  # the directory does not exist (or can't be listed)
+            return False
+        if found != names:
+            return False
+    return True
+
+
+def _pan(audio: AudioSegment, pan_amount: float) -> AudioSegment:
+    """
+    Same as AudioSegment.pan, but scales both channels in a single NumPy pass instead of
+    splitting, scaling, re-interleaving and adding them back together.
+
+    :param audio: Mono or stereo audio.
+    :param pan_amount: The balance (-1.0 is left, 1.0 is right).
+    :return: The panned stereo audio.
+    """
+    if audio.sample_width not in _SAMPLE_DTYPES or audio.channels > 2:
+        return audio.pan(pan_amount)
+    # the channel gains pydub works out (a 3 dB boost at most on the louder side)
+    max_boost_db = ratio_to_db(2.0)
+    boost_db = abs(pan_amount) * max_boost_db
+    reduce_db = ratio_to_db(db_to_float(max_boost_db) - db_to_float(boost_db))
+    boost_db = boost_db / 2.0
+    left_db, right_db = (boost_db, reduce_db) if pan_amount < 0 else (reduce_db, boost_db)
+    samples = np.frombuffer(audio.raw_data, dtype=_SAMPLE_DTYPES[audio.sample_width])
+    samples = samples.reshape(-1, audio.channels)
+    gains = np.array([db_to_float(left_db), db_to_float(right_db)])
+    # clip and round down exactly like audioop.mul (mono feeds both channels)
+    limits = np.iinfo(samples.dtype)
+    panned = np.floor(np.clip(samples * gains, limits.min, limits.max)).astype(samples.dtype)
+    # a mono input becomes stereo, so the frame width doubles too (as in pydub's own pan)
+    return audio._spawn(panned.tobytes(), overrides={"channels": 2, "frame_width": 2 * audio.sample_width})
+
+
+def _nonsilent_ranges(audio: AudioSegment, min_silence_len: int, silence_thresh: int,
+                      keep_silence: int = 100) -> list[list[int]]:
+    """
+    Finds the [start, end] ranges (ms) that pydub.silence.split_on_silence would cut the
+    audio into, computing the RMS of every min_silence_len window from a running sum of
+    squares instead of re-reading each window.
+
+    :param audio: The audio to split.
+    :param min_silence_len: Minimum length of silence between words (ms).
+    :param silence_thresh: Silence threshold in dB.
+    :param keep_silence: Silence to keep either side of each chunk (ms).
+    :return: List of [start, end] ranges in milliseconds.
+    """
+    seg_len = len(audio)
+    silent_ranges = []
+    # you can't have a silent portion of a sound that is longer than the sound
+    if seg_len >= min_silence_len:
+        samples = np.array(audio.get_array_of_samples())
+        # integer squares keep the running sum exact for 8 and 16 bit audio
+        samples = samples.astype(np.int64 if audio.sample_width <= 2 else np.float64)
+        frame_power = (samples * samples).reshape(-1, audio.channels).sum(axis=1)
+        running_power = np.concatenate(([0], np.cumsum(frame_power)))
+        # a window starting every ms, with its first and last frame worked out as pydub slices do
+        starts = np.arange(seg_len - min_silence_len + 1)
+        first = (starts * audio.frame_rate / 1000.0).astype(np.int64)
+        last = ((starts + min_silence_len) * audio.frame_rate / 1000.0).astype(np.int64)
+        # frames past the end of the data count as silence, as pydub pads them
+        power = running_power[np.minimum(last, len(frame_power))] - running_power[np.minimum(first, len(frame_power))]
+        # rounded down like audioop.rms
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rms = np.floor(np.sqrt(power / ((last - first) * audio.channels)))
+        threshold = 10 ** (silence_thresh / 20) * audio.max_possible_amplitude
+        silence_starts = np.flatnonzero(rms <= threshold)
+        if len(silence_starts):
+            # combine the silent windows into ranges, merging windows that overlap
+            breaks = np.flatnonzero(np.diff(silence_starts) > min_silence_len)
+            range_starts = np.concatenate(([silence_starts[0]], silence_starts[breaks + 1]))
+            range_ends = np.concatenate((silence_starts[breaks], [silence_starts[-1]])) + min_silence_len
+            silent_ranges = [[int(start), int(end)] for start, end in zip(range_starts, range_ends)]
+    # the non-silent ranges lie between the silent ones
+    if not silent_ranges:
+        nonsilent_ranges = [[0, seg_len]]
+    elif silent_ranges[0] == [0, seg_len]:
+        nonsilent_ranges = []
+    else:
+        nonsilent_ranges = []
+        prev_end = 0
+        for start, end in silent_ranges:
+            nonsilent_ranges.append([prev_end, start])
+            prev_end = end
+        if prev_end != seg_len:
+            nonsilent_ranges.append([prev_end, seg_len])
+        if nonsilent_ranges[0] == [0, 0]:
+            nonsilent_ranges.pop(0)
+    # keep some silence either side, splitting it evenly where two chunks would overlap
+    output_ranges = [[start - keep_silence, end + keep_silence] for start, end in nonsilent_ranges]
+    for range_i, range_ii in zip(output_ranges, output_ranges[1:]):
+        if range_ii[0] < range_i[1]:
+            range_i[1] = (range_i[1] + range_ii[0]) // 2
+            range_ii[0] = range_i[1]
+    return [[max(start, 0), min(end, seg_len)] for start, end in output_ranges]
+
+
+def _spread_out_phrases(filename: str, min_silence_len: int, silence_thresh: int,
+                        silence_add: int) -> tuple[int, int, AudioSegment]:
+    """
+    Loads an MP3 file and spreads out the phrases by adding silence between them.
+    A module-level function so that it can be run in a worker process.
+
+    :param filename: Path to the input MP3 file.
+    :param min_silence_len: Minimum length of silence between words (ms).
+    :param silence_thresh: Silence threshold in dB.
+    :param silence_add: Amount of silence to add between phrases (ms).
+    :return: Tuple containing the old and new file lengths in milliseconds, and the new audio.
+    """
+    # Load the audio file
+    audio = AudioSegment.from_mp3(filename)
+    old_file_length = len(audio)
+
+    # Split the audio into chunks (words) based on silence
+    # (min_silence_len is the minimum length of silence between words (ms), and anything
+    # quieter than silence_thresh dBFS is considered silence)
+    chunks = _nonsilent_ranges(audio, min_silence_len, silence_thresh)
+    # Create a new audio segment with silence
+    random_dev = silence_add // 3  # Add some randomness to the silence duration
+    # Spread out the words by adding silence between them, collecting the raw chunk data
+    # and joining it once rather than adding AudioSegments together
+    # (all the gap lengths are drawn at once, each within random_dev of silence_add)
+    silence_lengths = np.random.default_rng().integers(silence_add - random_dev, silence_add + random_dev,
+                                                       size=len(chunks) - 1, endpoint=True)
+    parts = [audio[chunks[0][0]:chunks[0][1]].raw_data]
+    for (start, end), silence_ms in zip(chunks[1:], silence_lengths.tolist()):
+        parts.append(bytes(int(silence_ms * audio.frame_rate / 1000) * audio.frame_width))
+        parts.append(audio[start:end].raw_data)
+    spread_audio = audio._spawn(b"".join(parts))
+    # Rename filename with _original added
+    base_name = os.path.splitext(os.path.basename(filename))[0]
+    new_filename = f"{base_name}_original.mp3"
+    # Rename the original file
+    os.rename(filename, new_filename)
+    new_file_length = len(spread_audio)
+    # Export the new audio file
+    spread_audio.export(filename, format="mp3")
+    return old_file_length, new_file_length, spread_audio
 
 
 class MP3Merger:
@@ -17,6 +177,7 @@ class MP3Merger:
     :param rear_buffer: Duration of silence to add at the end of the output file in seconds.
     :param balance_even: Balance factor for even voice segments (-1 to 1)
     :param balance_odd: Balance factor for odd voice segments (-1 to 1)
+    :param max_workers: Number of processes used to spread out the files (1 spreads them serially).
     """
     def __init__(self, mp3_files: List[str],
                  duration: float,
@@ -27,7 +188,8 @@ class MP3Merger:
                  min_silence_len: int = 800,
                  silence_thresh: int = -50,
                  silence_add: int = 8000,
-                 spread_out: bool = False
+                 spread_out: bool = False,
+                 max_workers: int = 1
                  ):
         """
         MP3Merger class to merge multiple MP3 files in order into a single MP3 file of
@@ -45,6 +207,10 @@ class MP3Merger:
         :param silence_thresh: Silence threshold in dB.
         :param silence_add: Amount of silence to add to the beginning and end of each segment (ms).
         :param spread_out: Boolean indicating if phrases should be spread out with silence.
+        :param max_workers: Number of processes used to spread out the files. The default of 1
+            spreads them one after another in this process. With more than 1 a process pool is
+            used, so on platforms that start processes with spawn (Windows, macOS) the calling
+            script must create and merge inside an ``if __name__ == "__main__":`` guard.
         """
 
         self.duration = duration
@@ -58,6 +224,14 @@ class MP3Merger:
         self.min_silence_len = min_silence_len
         self.silence_thresh = silence_thresh
         self.spread_out = spread_out
+        self.max_workers = max_workers
+        # spread out audio already in memory, so merge need not decode its file again
+        self._preloaded = {}
+        # the merged audio, kept after merge so it can be handed to MP3Mixer without decoding output_file
+        self.merged_segment = None
+        # the settings last found to be valid, so merge only checks them again if they have changed
+        self._validated = None
+        self._validate()
 
     def merge(self) -> str:
         """
@@ -65,29 +239,13 @@ class MP3Merger:
         If the total duration of the input MP3 files is less than the target duration,
         silences are inserted between the MP3 files to achieve the target duration.
         """
-        if len(self.mp3_files) == 1:
-            raise ValueError("At least two MP3 files are required.")
-        if self.mp3_files is None or len(self.mp3_files) == 0:
-            raise ValueError("No MP3 files provided.")
-        if not all(file.endswith(".mp3") for file in self.mp3_files):
-            raise ValueError("All input files must be in MP3 format.")
-        if not all(os.path.exists(file) for file in self.mp3_files):
-            raise ValueError("All input files must exist.")
-        if self.duration <= 0:
-            raise ValueError("Duration must be greater than zero.")
-        if self.front_buffer < 0:
-            raise ValueError("Front buffer must be positive.")
-        if self.rear_buffer < 0:
-            raise ValueError("Rear buffer must be positive.")
-        if self.balance_even < -1 or self.balance_even > 1:
-            raise ValueError("Balance for even segments must be between -1 and 1.")
-        if self.balance_odd < -1 or self.balance_odd > 1:
-            raise ValueError("Balance for odd segments must be between -1 and 1.")
+        self._validate()
         # Adds silences into spoken word files if spread_out is True
         if self.spread_out:
             self.spread_out_all_files()
-        # Load all MP3 files and calculate their total duration
-        segments = [AudioSegment.from_mp3(file) for file in self.mp3_files]
+        # Load all MP3 files (unless they were just spread out) and calculate their total duration
+        segments = [self._preloaded.pop(file) if file in self._preloaded else AudioSegment.from_mp3(file)
+                    for file in self.mp3_files]
         total_duration = sum(segment.duration_seconds for segment in segments)
         # Ensure the target duration is at least as large as the total duration of all MP3 files
         if total_duration > self.duration:
@@ -97,23 +255,68 @@ class MP3Merger:
         total_silence_duration = self.duration - total_duration
         # not len(segments) + 1
         silence_duration = total_silence_duration / len(segments) if len(segments) > 1 else total_silence_duration
-        silence_segment = AudioSegment.silent(duration=silence_duration * 1000)  # Convert seconds to milliseconds
-        # Apply stereo balance to each segment
+        # Apply stereo balance to each segment, then bring them all to one format
+        # (the one pydub would have converted everything to when concatenating:
+        # stereo, at the highest frame rate and sample width, and no lower than
+        # AudioSegment.silent's 11025 Hz / 16 bit) so their raw samples can simply be joined
+        frame_rate = max([11025] + [segment.frame_rate for segment in segments])
+        sample_width = max([2] + [segment.sample_width for segment in segments])
         for i, segment in enumerate(segments):
             if i % 2 == 0:
-                segments[i] = segment.pan(self.balance_even)  # Apply even balance
+                segment = _pan(segment, self.balance_even)  # Apply even balance
             else:
-                segments[i] = segment.pan(self.balance_odd)  # Apply odd balance
-        # Create the merged audio segment
-        merged_segment = AudioSegment.silent(duration=self.front_buffer) + segments[0]
+                segment = _pan(segment, self.balance_odd)  # Apply odd balance
+            segments[i] = segment.set_frame_rate(frame_rate).set_channels(2).set_sample_width(sample_width)
+        frame_width = 2 * sample_width
+
+        def silence(duration_ms: float) -> bytes:
+            # 16 bit and wider samples are signed, so silence is all zero bytes
+            return bytes(int(duration_ms * frame_rate / 1000) * frame_width)
+
+        # Collect the raw data of the merged audio in order and join it in a single copy.
+        # Adding AudioSegments together copies the whole of the merged audio so far every time
+        silence_segment = silence(silence_duration * 1000)  # Convert seconds to milliseconds
+        parts = [silence(self.front_buffer), segments[0].raw_data]
         for segment in segments[1:]:
-            merged_segment += silence_segment + segment
-        merged_segment += AudioSegment.silent(duration=silence_duration * 1000) + AudioSegment.silent(
-            duration=self.rear_buffer)
+            parts.extend((silence_segment, segment.raw_data))
+        # the last gap and the rear buffer as a single run of silence
+        parts.append(silence(silence_duration * 1000 + self.rear_buffer))
+        merged_segment = segments[0]._spawn(b"".join(parts))
+        self.merged_segment = merged_segment
         # Export the final merged audio segment to an MP3 file
         merged_segment.export(self.output_file, format="mp3")
         return self.output_file
 
+    def _validate(self):
+        """
+        Checks the merge settings, raising a ValueError for the first one that is invalid.
+        The checks are skipped if the settings are the same as the last time they passed
+        (mp3_files or the other settings may be changed between merges).
+        """
+        settings = (None if self.mp3_files is None else tuple(self.mp3_files), self.duration,
+                    self.front_buffer, self.rear_buffer, self.balance_even, self.balance_odd)
+        if settings == self._validated:
+            return
+        if self.mp3_files is not None and len(self.mp3_files) == 1:
+            raise ValueError("At least two MP3 files are required.")
+        if self.mp3_files is None or len(self.mp3_files) == 0:
+            raise ValueError("No MP3 files provided.")
+        if not all(file.endswith(".mp3") for file in self.mp3_files):
+            raise ValueError("All input files must be in MP3 format.")
+        if not _all_files_exist(self.mp3_files):
+            raise ValueError("All input files must exist.")
+        if self.duration <= 0:
+            raise ValueError("Duration must be greater than zero.")
+        if self.front_buffer < 0:
+            raise ValueError("Front buffer must be positive.")
+        if self.rear_buffer < 0:
+            raise ValueError("Rear buffer must be positive.")
+        if self.balance_even < -1 or self.balance_even > 1:
+            raise ValueError("Balance for even segments must be between -1 and 1.")
+        if self.balance_odd < -1 or self.balance_odd > 1:
+            raise ValueError("Balance for odd segments must be between -1 and 1.")
+        self._validated = settings
+
     def spread_out_phrases(self, filename: str) -> tuple[int, int]:
         """
         Loads an MP3 file and spreads out the phrases by adding silence between them.
@@ -121,38 +324,25 @@ class MP3Merger:
         :param filename: Path to the input MP3 file.
         :return: Tuple containing the old and new file lengths in milliseconds.
         """
-        # Load the audio file
-        audio = AudioSegment.from_mp3(filename)
-        old_file_length = len(audio)
-
-        # Split the audio into chunks (words) based on silence
-        chunks = split_on_silence(
-            audio,
-            min_silence_len=self.min_silence_len,  # Minimum length of silence between words (ms)
-            silence_thresh=self.silence_thresh  # Consider anything quieter than -50 dBFS as silence
-        )
-        # Create a new audio segment with silence
-        random_dev = self.silence_add // 3  # Add some randomness to the silence duration
-        # Spread out the words by adding silence between them
-        spread_audio = chunks[0]
-        for chunk in chunks[1:]:
-            silence = AudioSegment.silent(
-                duration=self.silence_add -
-                         random_dev + random.randint(0, random_dev * 2))  # Add some randomness to the silence duration
-            spread_audio += silence + chunk
-        # Rename filename with _original added
-        base_name = os.path.splitext(os.path.basename(filename))[0]
-        new_filename = f"{base_name}_original.mp3"
-        # Rename the original file
-        os.rename(filename, new_filename)
-        new_file_length = len(spread_audio)
-        # Export the new audio file
-        spread_audio.export(filename, format="mp3")
+        old_file_length, new_file_length, spread_audio = _spread_out_phrases(
+            filename, self.min_silence_len, self.silence_thresh, self.silence_add)
+        self._preloaded[filename] = spread_audio
         return old_file_length, new_file_length
 
     def spread_out_all_files(self):
         """
         Spreads out the phrases in all MP3 files.
         """
-        for file in self.mp3_files:
-            self.spread_out_phrases(file)
+        workers = min(len(self.mp3_files), self.max_workers or 1)
+        if workers <= 1:
+            for file in self.mp3_files:
+                self.spread_out_phrases(file)
+            return
+        # each file is decoded, split and re-encoded independently, so (when asked for) use up to
+        # max_workers processes (each worker draws its random gaps from a freshly seeded generator)
+        n = len(self.mp3_files)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_spread_out_phrases, self.mp3_files, [self.min_silence_len] * n,
+                                   [self.silence_thresh] * n, [self.silence_add] * n)
+            for file, (_, _, spread_audio) in zip(self.mp3_files, results):
+                self._preloaded[file] = spread_audio
@@ -1,8 +1,43 @@
+import hashlib
 import os
 import random
+import wave
 from pydub import AudioSegment
+from pydub.utils import db_to_float, ratio_to_db
 import numpy as np
 
+_MODULE_DIR = os.path.dirname(os.path.realpath(__file__))  # the sounds_dir is relative to it
+# decoded copies of the ambient files (see MP3Mixer.load_ambient), unless ambient_cache_dir is given
+_AMBIENT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "meditation_video", "ambient")
+# numpy types of pydub's signed sample widths
+_SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def _ambient_cache_path(ambient_file: str, cache_dir: str = "") -> str:
+    """
+    Where the decoded WAV copy of an ambient file is cached. The name includes a hash of the
+    file's full path, so ambient files of the same name in different directories don't clash.
+
+    :param ambient_file: Path to the ambient sound file.
+    :param cache_dir: The cache directory (defaults to ~/.cache/meditation_video/ambient).
+    :return: Path of the cached WAV file.
+    """
+    digest = hashlib.sha256(os.path.realpath(ambient_file).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir or _AMBIENT_CACHE_DIR, f"{digest}_{os.path.basename(ambient_file)}.wav")
+
+
+def _scale_samples(samples: np.ndarray, factor: float, sample_type=None) -> np.ndarray:
+    """
+    Multiplies samples by a gain factor, clipping and rounding down like audioop.mul.
+
+    :param samples: The samples to scale.
+    :param factor: The gain factor.
+    :param sample_type: The sample type to clip to (defaults to the type of samples).
+    :return: The scaled samples.
+    """
+    limits = np.iinfo(sample_type or samples.dtype)
+    return np.floor(np.clip(samples * factor, limits.min, limits.max)).astype(sample_type or samples.dtype)
+
 
 class MP3Mixer:
     """
@@ -22,6 +57,10 @@ class MP3Mixer:
     :param fade_in_time: Fade-in time for the ambient file.
     :param fade_out_time: Fade-out time for the ambient file.
     :param power_ratio: Power ratio (higher means louder voice) between the voice and the binaural beats or the ambient sound.
+    :param audio_segment: The input audio already in memory (e.g. MP3Merger.merged_segment), used instead of
+        decoding mp3_file.
+    :param ambient_cache_dir: Directory for the decoded WAV copies of the ambient files (about 10 MB per
+        minute of audio each). If empty, ~/.cache/meditation_video/ambient is used.
     """
     def __init__(self, mp3_file: str, working_dir: str = "",
                  sounds_dir: str = "ambient_files",
@@ -35,7 +74,9 @@ class MP3Mixer:
                  fade_in_time: float = 4,
                  fade_out_time: float = 4,
                  ambient_file_gain_db: int = -20,
-                 power_ratio=None
+                 power_ratio=None,
+                 audio_segment: AudioSegment = None,
+                 ambient_cache_dir: str = ""
                  ):
         self.binaural_fade_out_duration = binaural_fade_out_duration
         self.mp3_file = mp3_file
@@ -47,32 +88,34 @@ class MP3Mixer:
         self.base_freq = base_freq
         self.sample_rate = sample_rate
         self.sounds_dir = sounds_dir
+        self.ambient_cache_dir = ambient_cache_dir
         self.num_samples_to_chop = num_samples_to_chop
         self.fade_in_time = fade_in_time
         self.fade_out_time = fade_out_time
         self.ambient_file_gain_db = ambient_file_gain_db
         self.power_ratio = power_ratio
+        self.audio_segment = audio_segment
+        # the settings last found to be valid, so mix_audio only checks them again if they have changed
+        self._validated = None
 
     @staticmethod
     def calculate_average_power(audio_segment: AudioSegment) -> np.ndarray:
-        # Convert the audio segment into an array of samples
-        samples = np.array(audio_segment.get_array_of_samples())
-        # Determine the number of channels in the audio (e.g., 1 for mono, 2 for stereo)
-        channels = audio_segment.channels
-        # Reshape the samples array to separate the channels.
-        # If there are multiple channels, the array will have a shape like (n_samples, n_channels).
-        samples = samples.reshape((-1, channels))
-        # Convert the samples to float64 type to prevent any issues with integer overflow
-        # when performing mathematical operations. This is especially important when
-        # dealing with audio data, as the samples are typically integers (e.g., 16-bit or 32-bit).
-        samples = np.asarray(samples, dtype=np.float64)
-        # Calculate the power (mean squared value) for each channel separately.
-        # This involves squaring each sample value (which gives us the power),
-        # and then taking the mean across all samples in each channel.
-        power_per_channel = np.mean(samples ** 2, axis=0)
-        # Compute the average power across all channels.
-        # If the audio is stereo, this will be the mean of the power of the left and right channels.
-        average_power = np.mean(power_per_channel)
+        # View the raw sample data directly as an array of samples, without copying it
+        samples = np.frombuffer(audio_segment.raw_data, dtype=_SAMPLE_DTYPES[audio_segment.sample_width])
+        # Convert the samples to a wider type to prevent any issues with integer overflow
+        # when squaring and summing them. 8 and 16 bit squares add up exactly in int64,
+        # wider samples could overflow it, so use float64 for those.
+        wide_type = np.int64 if audio_segment.sample_width <= 2 else np.float64
+        # Calculate the power (mean squared value) over all the samples, a cache-sized block
+        # at a time so the widened copy never grows beyond 1 MB, with a fused multiply-and-sum
+        # for each block. Every channel has the same number of samples, so this is also the
+        # average of the power of each channel (e.g. of the left and right channels if the
+        # audio is stereo).
+        total_power = 0
+        for start in range(0, samples.size, 131072):
+            block = samples[start:start + 131072].astype(wide_type)
+            total_power += np.einsum('i,i->', block, block).item()
+        average_power = total_power / samples.size if samples.size else np.nan  # nan for no audio, like np.mean
         return average_power
 
     def adjust_power_overlay_and_normalise(self, stereo_audio_segment_1: AudioSegment,
@@ -94,33 +137,150 @@ class MP3Mixer:
         The square root is applied because power is proportional to the square of the amplitude. To scale the amplitude to achieve the desired power, you need to take the square root of the ratio of the powers.
         Without the square root, you'd be adjusting power directly rather than amplitude, which would result in an incorrect adjustment.
         """
-        scaling_factor = np.sqrt((power_2 * self.power_ratio) / power_1)
-        # Step 4: Adjust the gain of the second (music / binaural) audio segment based on the scaling factor.
+        # Step 4: Adjust the gain of the second (music / binaural) audio segment based on the scaling factor
+        # sqrt((power_2 * power_ratio) / power_1).
         # The scaling factor is converted to a decibel value (dB), which is applied as a gain reduction
         # to the second segment. The negative sign ensures that the power ratio is maintained.
         # apply_gain() applies a gain adjustment in decibels to the audio segment.
         # so because power scaling factor is based on power, we need to convert it to dB
         # using the formula: 10 * log10(scaling_factor)
-        # the -ve is to reduce the gain of the second (music / binaural) audio segment
-        adjusted_audio_segment_2 = stereo_audio_segment_2.apply_gain(-10 * np.log10(scaling_factor))
-        combined = stereo_audio_segment_1.overlay(adjusted_audio_segment_2)
-        final_stereo_audio = combined.normalize()
+        # the -ve is to reduce the gain of the second (music / binaural) audio segment.
+        # -10 * log10(sqrt(x)) is -5 * log10(x), so the gain is worked out in log space without the
+        # sqrt, which also means there is no division by the speech power. A silent second segment
+        # stays silent whatever the gain, so it is left at 0 dB rather than an infinite boost.
+        with np.errstate(divide="ignore"):
+            gain_db = 5.0 * (np.log10(power_1) - np.log10(power_2) - np.log10(self.power_ratio)) \
+                if power_2 else 0.0
+        if (stereo_audio_segment_1.sample_width not in _SAMPLE_DTYPES
+                or stereo_audio_segment_2.sample_width not in _SAMPLE_DTYPES):
+            adjusted_audio_segment_2 = stereo_audio_segment_2.apply_gain(gain_db)
+            combined = stereo_audio_segment_1.overlay(adjusted_audio_segment_2)
+            final_stereo_audio = combined.normalize()
+            return final_stereo_audio
+        # The gain, overlay and normalize are done on the sample arrays rather than as three
+        # pydub operations that each copy the whole mix, but they clip and round just as
+        # apply_gain(), overlay() and normalize() do, so the result is identical.
+        samples_2 = np.frombuffer(stereo_audio_segment_2.raw_data,
+                                  dtype=_SAMPLE_DTYPES[stereo_audio_segment_2.sample_width])
+        adjusted_audio_segment_2 = stereo_audio_segment_2._spawn(
+            _scale_samples(samples_2, db_to_float(float(gain_db))).tobytes())
+        # overlay() first brings both segments to the same channels, frame rate and sample width
+        segment_1, segment_2 = AudioSegment._sync(stereo_audio_segment_1, adjusted_audio_segment_2)
+        sample_type = _SAMPLE_DTYPES[segment_1.sample_width]
+        limits = np.iinfo(sample_type)
+        # the sum of the overlaid part is clipped to the sample range; the mix is as long as the speech
+        combined = np.frombuffer(segment_1[0:].raw_data, dtype=sample_type).astype(np.int64)
+        overlay = np.frombuffer(segment_2.raw_data, dtype=sample_type)[:len(combined)]
+        combined[:len(overlay)] += overlay
+        np.clip(combined, limits.min, limits.max, out=combined)
+        # normalize() boosts the peak to 0.1 dB below full scale (silence is left as it is)
+        peak = max(abs(int(combined.max(initial=0))), abs(int(combined.min(initial=0))))
+        if peak:
+            target_peak = segment_1.max_possible_amplitude * db_to_float(-0.1)
+            combined = _scale_samples(combined, db_to_float(ratio_to_db(target_peak / peak)), sample_type)
+        final_stereo_audio = segment_1._spawn(combined.astype(sample_type).tobytes())
         return final_stereo_audio
 
-    def overlay_ambient(self, spoken_file_a: str, ambient_file_b: str) -> AudioSegment:
-        if not os.path.exists(spoken_file_a):
-            raise FileNotFoundError(f"Spoken audio file {spoken_file_a} not found.")
-        if not os.path.exists(ambient_file_b):
-            raise FileNotFoundError(f"Ambient audio file {ambient_file_b} not found.")
-        spoken_audio_a = AudioSegment.from_file(spoken_file_a)
-        ambient_audio_b = AudioSegment.from_file(ambient_file_b)
-        spoken_duration_a = len(spoken_audio_a)
-        ambient_audio_b = ambient_audio_b[self.num_samples_to_chop:]
-        max_start_time = len(ambient_audio_b) - spoken_duration_a
+    @staticmethod
+    def load_ambient(ambient_file: str, cache_dir: str = "") -> AudioSegment:
+        """
+        Loads an ambient sound file. The same few ambient files are used run after run, so
+        the first load also saves the decoded audio as a WAV file in the cache directory
+        (not next to the ambient file, which may be inside the installed package), and
+        later loads read that instead of decoding the MP3 again.
+
+        :param ambient_file: Path to the ambient sound file.
+        :param cache_dir: The cache directory (defaults to ~/.cache/meditation_video/ambient).
+        :return: The decoded ambient audio.
+        """
+        cache_path = _ambient_cache_path(ambient_file, cache_dir)
+        try:
+            # the cache is only used if it is newer than the file it was decoded from
+            if os.path.getmtime(cache_path) >= os.path.getmtime(ambient_file):
+                return AudioSegment.from_wav(cache_path)
+        except OSError:
+            pass  # no cache yet
+        ambient_audio = AudioSegment.from_file(ambient_file)
+        # write the cache under a temporary name first, so a concurrent run never reads half of it
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            ambient_audio.export(tmp_path, format="wav")
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            # e.g. the cache directory is read-only; the cache is only an optimisation
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return ambient_audio
+
+    def _ambient_window(self, ambient_file: str, duration: int) -> AudioSegment:
+        """
+        Picks a random window of the ambient file, after the first num_samples_to_chop ms.
+        Once the ambient file has a WAV cache (see load_ambient) only the window itself is read.
+
+        :param ambient_file: Path to the ambient sound file.
+        :param duration: Length of the window in milliseconds.
+        :return: The ambient audio for the window.
+        """
+        cache_path = _ambient_cache_path(ambient_file, self.ambient_cache_dir)
+        try:
+            if os.path.getmtime(cache_path) >= os.path.getmtime(ambient_file):
+                return self._read_wav_window(cache_path, duration)
+        except (OSError, wave.Error):
+            pass  # no usable cache yet
+        # the whole file has to be decoded anyway, so take the window from that
+        ambient_audio = self.load_ambient(ambient_file, self.ambient_cache_dir)[self.num_samples_to_chop:]
+        max_start_time = len(ambient_audio) - duration
         if max_start_time < 0:
             raise ValueError("Overlay_ambient: Ambient audio file is not long enough to extract the desired segment.")
         start_time = random.randint(0, max_start_time)
-        ambient_segment_b = ambient_audio_b[start_time:start_time + spoken_duration_a]
+        return ambient_audio[start_time:start_time + duration]
+
+    def _read_wav_window(self, wav_file: str, duration: int) -> AudioSegment:
+        """
+        Reads just a random window of a WAV file, picked exactly as slicing the fully loaded
+        file after the first num_samples_to_chop ms would pick it.
+
+        :param wav_file: Path to the WAV file.
+        :param duration: Length of the window in milliseconds.
+        :return: The audio for the window.
+        """
+        with wave.open(wav_file, "rb") as f:
+            frame_rate = f.getframerate()
+            frame_width = f.getsampwidth() * f.getnchannels()
+            num_frames = f.getnframes()
+
+            def frames(ms: float) -> int:
+                # the frame a millisecond position falls on, as pydub slices audio
+                return int(ms * frame_rate / 1000.0)
+
+            length = round(1000 * num_frames / frame_rate)
+            chop_start = frames(min(self.num_samples_to_chop, length))
+            chopped_length = round(1000 * (frames(length) - chop_start) / frame_rate)
+            max_start_time = chopped_length - duration
+            if max_start_time < 0:
+                raise ValueError("Overlay_ambient: Ambient audio file is not long enough to extract the desired segment.")
+            start_time = random.randint(0, max_start_time)
+            window_start = frames(start_time)
+            window_frames = frames(min(start_time + duration, chopped_length)) - window_start
+            f.setpos(min(chop_start + window_start, num_frames))
+            data = f.readframes(window_frames)
+            # pydub pads a window that runs just past the end with silence
+            data += bytes(window_frames * frame_width - len(data))
+            return AudioSegment(data, frame_rate=frame_rate, sample_width=f.getsampwidth(),
+                                channels=f.getnchannels())
+
+    def overlay_ambient(self, spoken_file_a: str, ambient_file_b: str,
+                        spoken_audio_a: AudioSegment = None) -> AudioSegment:
+        # spoken_audio_a is the spoken audio if it has already been loaded, so it is not decoded twice
+        if spoken_audio_a is None and not os.path.isfile(spoken_file_a):
+            raise FileNotFoundError(f"Spoken audio file {spoken_file_a} not found.")
+        if not os.path.isfile(ambient_file_b):
+            raise FileNotFoundError(f"Ambient audio file {ambient_file_b} not found.")
+        if spoken_audio_a is None:
+            spoken_audio_a = AudioSegment.from_file(spoken_file_a)
+        spoken_duration_a = len(spoken_audio_a)
+        ambient_segment_b = self._ambient_window(ambient_file_b, spoken_duration_a)
         if self.fade_in_time > 0:
             ambient_segment_b = ambient_segment_b.fade_in(self.fade_in_time * 1000)
         elif self.fade_in_time < 0:
@@ -138,19 +298,46 @@ class MP3Mixer:
     def generate_binaural_beats(self, duration: int) -> AudioSegment:
         if duration <= 0:
             raise ValueError("generate_binaural_beats: Binaural duration must be greater than 0.")
-        t = np.linspace(0, duration, int(self.sample_rate * duration), endpoint=False)
-        beat_freq = np.linspace(self.start_beat_freq, self.end_beat_freq, len(t))
-        left_wave = np.sin(2 * np.pi * self.base_freq * t)
-        right_wave = np.sin(2 * np.pi * (self.base_freq + beat_freq) * t)
+        n = int(self.sample_rate * duration)
+        half_second = int(self.sample_rate / 2)
+        # the beat is synthesised a block of samples at a time (a whole number of half
+        # seconds, for the maxima count below) straight into the interleaved 16 bit frames,
+        # so no full-length float arrays are ever built
+        block_size = 16 * half_second
+        audio_array = np.empty((n, 2), dtype=np.int16)
+        # the phase runs to millions of radians so stays float64, but the waves are only
+        # written out as 16 bit, so float32 is plenty for them
+        left_wave = np.empty(min(n, block_size), dtype=np.float32)
+        right_wave = np.empty(min(n, block_size), dtype=np.float32)
+        num_maxima = np.empty(-(-n // half_second), dtype=np.int64)
+
+        def synthesise(left_too: bool) -> None:
+            # sample i is at time i * duration / n and has a beat frequency of
+            # start + i * (end - start) / (n - 1), exactly as np.linspace would give them
+            beat_step = (self.end_beat_freq - self.start_beat_freq) / (n - 1) if n > 1 else 0
+            for start in range(0, n, block_size):
+                i = np.arange(start, min(start + block_size, n))
+                t = i * (duration / n)
+                beat_freq = i * beat_step + self.start_beat_freq
+                if i[-1] == n - 1:
+                    beat_freq[-1] = self.end_beat_freq
+                left, right = left_wave[:len(i)], right_wave[:len(i)]
+                np.sin(2 * np.pi * (self.base_freq + beat_freq) * t, out=right)
+                if left_too:
+                    np.sin(2 * np.pi * self.base_freq * t, out=left)
+                    # find the number of peaks > 1- epsilon in wave_diff for each 0.5 second interval
+                    # (the last interval may be shorter)
+                    wave_diff = left - right
+                    num_maxima[start // half_second:(start + len(i) - 1) // half_second + 1] = \
+                        np.add.reduceat(wave_diff > 1-1e-3, np.arange(0, len(i), half_second))
+                    # scale the wave in place and write it straight into its channel
+                    audio_array[start:start + len(i), 0] = np.multiply(left, 32767, out=left)
+                audio_array[start:start + len(i), 1] = np.multiply(right, 32767, out=right)
+
         """What makes this complicated is that certain beat frequency sweeps seem to lead to
         the beat going in the opposite direction at some point. This is not what we want.
         So first we calculate the rate of maxima close to one and check it is moving in one direction."""
-        wave_diff = left_wave - right_wave
-        # find the number of peaks > 1- epsilon in wave_diff for each 0.5 second interval
-        num_maxima = []
-        for i in range(0, len(wave_diff), int(self.sample_rate / 2)):
-            num_maxima.append(len(np.where(wave_diff[i:i + int(self.sample_rate / 2)] > 1-1e-3)[0]))
-        num_maxima = np.array(num_maxima) # this is the rate of maxima per 0.5 seconds
+        synthesise(left_too=True)  # num_maxima is the rate of maxima per 0.5 seconds
         # calculate coefficient of variation across num_maxima
         cv = 100*np.std(num_maxima) / np.mean(num_maxima)
         # if this rate of maxmima varies too much, there is a cross over point where the beat goes in the opposite direction
@@ -162,7 +349,8 @@ class MP3Mixer:
             # convert to seconds
             est_time = est_time_idx / self.sample_rate
             # what would the beat frequency be at this time?
-            est_beat_freq = beat_freq[est_time_idx]
+            # (the same value np.linspace(start_beat_freq, end_beat_freq, n) gives for the index)
+            est_beat_freq = est_time_idx * ((self.end_beat_freq - self.start_beat_freq) / (n - 1)) + self.start_beat_freq
             # now set the end beat frequency to this
             # rounding up or down depending what way we're going.
             if self.start_beat_freq > self.end_beat_freq:
@@ -171,12 +359,9 @@ class MP3Mixer:
             else: # round down
                 # round down the estimated beat frequency to the nearest integer
                 self.start_beat_freq = np.floor(est_beat_freq)
-        # reconfigure for the new end beat frequency
-        beat_freq = np.linspace(self.start_beat_freq, self.end_beat_freq, len(t))
-        left_wave = np.sin(2 * np.pi * self.base_freq * t)
-        right_wave = np.sin(2 * np.pi * (self.base_freq + beat_freq) * t)
-        stereo_wave = np.vstack((left_wave, right_wave)).T.flatten()
-        audio_array = (stereo_wave * 32767).astype(np.int16)
+            # reconfigure for the new end beat frequency. The left wave is just the
+            # base frequency, so only the right wave has to be regenerated
+            synthesise(left_too=False)
         binaural_segment = AudioSegment(
             audio_array.tobytes(),
             frame_rate=self.sample_rate,
@@ -186,17 +371,25 @@ class MP3Mixer:
         binaural_segment = binaural_segment.fade_out(self.binaural_fade_out_duration*1000)
         return binaural_segment
 
-    def mix_audio(self) -> str:
-        if not self.mp3_file:
-            raise ValueError("Error: mp3_file is an empty string.")
-        if not os.path.exists(self.mp3_file):
-            raise FileNotFoundError(f"Error: {self.mp3_file} does not exist.")
-        if not self.mp3_file.endswith(".mp3"):
-            raise ValueError(f"Error: {self.mp3_file} is not an MP3 file.")
+    def _validate(self):
+        """
+        Checks the mix settings, raising for the first one that is invalid. The checks are
+        skipped if the settings are the same as the last time they passed. This is not done
+        in __init__, as the mixer is often built before the file it will mix exists.
+        """
+        settings = (self.mp3_file, self.audio_segment is None, self.power_ratio, self.binaural,
+                    self.start_beat_freq, self.end_beat_freq, self.base_freq, self.binaural_fade_out_duration)
+        if settings == self._validated:
+            return
+        if self.audio_segment is None:
+            if not self.mp3_file:
+                raise ValueError("Error: mp3_file is an empty string.")
+            if not os.path.isfile(self.mp3_file):
+                raise FileNotFoundError(f"Error: {self.mp3_file} does not exist.")
+            if not self.mp3_file.endswith(".mp3"):
+                raise ValueError(f"Error: {self.mp3_file} is not an MP3 file.")
         if self.power_ratio and self.power_ratio < 0:
             raise ValueError(f"Power ratio must be positive, not {self.power_ratio}.")
-        input_audio = AudioSegment.from_mp3(self.mp3_file)
-        duration = input_audio.duration_seconds
         if self.binaural:
             if self.start_beat_freq <= 0:
                 raise ValueError("Error: start_beat_freq must be greater than 0.")
@@ -206,14 +399,25 @@ class MP3Mixer:
                 raise ValueError("Error: base_freq must be greater than 0.")
             if self.binaural_fade_out_duration < 0:
                 raise ValueError("Error: binaural_fade_out_duration must be greater than or equal to 0.")
+        self._validated = settings
+
+    def mix_audio(self) -> str:
+        self._validate()
+        # use the audio handed over in memory if there is some, rather than an MP3 round trip
+        if self.audio_segment is not None:
+            input_audio = self.audio_segment
+        else:
+            input_audio = AudioSegment.from_mp3(self.mp3_file)
+        duration = input_audio.duration_seconds
+        if self.binaural:
             binaural_segment = self.generate_binaural_beats(duration)
             if not self.power_ratio:
                 self.power_ratio = 350000 # increasing this reduces the binaural beat volume (450000 is too quiet binaural)
             mixed_audio = self.adjust_power_overlay_and_normalise(input_audio, binaural_segment)
         else:
-            my_dir = os.path.dirname(os.path.realpath(__file__))
+            my_dir = _MODULE_DIR
             sounds_dir = os.path.join(my_dir, self.sounds_dir)
-            if not os.path.exists(sounds_dir):
+            if not os.path.isdir(sounds_dir):
                 raise FileNotFoundError(f"Error: {sounds_dir} does not exist.")
             ambient_files = os.listdir(sounds_dir)
             if not any(file.endswith(".mp3") for file in ambient_files):
@@ -223,6 +427,6 @@ class MP3Mixer:
                 ambient_file = os.path.join(self.sounds_dir, random.choice(ambient_files))
                 print(f"Selected ambient file: {ambient_file}")
                 ambient_file = os.path.join(my_dir, ambient_file)
-            mixed_audio = self.overlay_ambient(self.mp3_file, ambient_file)
+            mixed_audio = self.overlay_ambient(self.mp3_file, ambient_file, spoken_audio_a=input_audio)
         mixed_audio.export(self.output_file, format="mp3")
         return self.output_file
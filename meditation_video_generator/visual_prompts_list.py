@@ -1,4 +1,4 @@
-visual_prompts = [
+visual_prompts = (
     "A peaceful forest clearing at dawn, with rays of sunlight filtering through the trees, highlighting a small stream flowing gently over smooth stones.",
     "A quiet lakeside scene at twilight, with mist rising from the water and a wooden dock leading out to the tranquil, mirror-like surface of the lake.",
     "A peaceful meadow filled with wildflowers in full bloom, a soft breeze rustling through the grass, and distant mountains bathed in golden sunlight.",
@@ -15,4 +15,4 @@ visual_prompts = [
     "A tranquil view of a star being born in a distant nebula, with clouds of gas and dust glowing softly in hues of orange, pink, and blue, and a beautiful lady standing on a nearby asteroid, mesmerized by the cosmic spectacle unfolding before her.",
     "A floating city made of translucent crystals suspended above a sea of glowing liquid light, waterfalls of pure energy cascading from the buildings, and a beautiful lady standing at the edge of the city, her presence a serene contrast to the crystalline architecture.",
     "A forest where the trees are made of liquid metal, constantly shifting and flowing, with leaves changing shape and color as they fall, and a beautiful lady walking among the trees, her reflection dancing in the metallic surfaces as she moves gracefully through the forest."
-]
+)
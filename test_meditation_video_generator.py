@@ -1,110 +1,161 @@
+import asyncio
 import base64
+import collections
+import hashlib
 import json
 import os
+import random
 import shutil
 import sys
+import threading
+import time
 
 import numpy as np
 import openai
-from moviepy.editor import ImageClip
-from pydub import AudioSegment
+from openai.types.chat import ChatCompletion
+from PIL import Image
 
 from meditation_video_generator import MeditationVideoGenerator
 from keys import KEY
-from unittest.mock import patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from types import SimpleNamespace
 import pytest
 from keys import KEY
 
-class DotDict(dict):
-    """A dictionary that supports dot notation and nested dictionaries.
-    This code ensures that all nested dictionaries within the original
-    dictionary (including those inside lists) are converted to DotDict
-    objects, allowing for recursive dot notation access to nested structures.
-    """
-    def __init__(self, d):
-        for key, value in d.items():
-            if isinstance(value, dict):
-                value = DotDict(value)
-            elif isinstance(value, list):
-                value = [DotDict(item) if isinstance(item, dict) else item for item in value]
-            self[key] = value
-
-    def __getattr__(self, key):
-        try:
-            return self[key]
-        except KeyError:
-            raise AttributeError(f"'DotDict' object has no attribute '{key}'")
+def _as_namespace(value):
+    """Converts a structure of dictionaries and lists (e.g. a mock API response) to nested
+    SimpleNamespace objects, so that it can be read with dot notation."""
+    return json.loads(json.dumps(value), object_hook=lambda d: SimpleNamespace(**d))
 
-    def __setattr__(self, key, value):
-        self[key] = value
 
-    def __delattr__(self, key):
-        try:
-            del self[key]
-        except KeyError:
-            raise AttributeError(f"'DotDict' object has no attribute '{key}'")
+def _sentence_counts(texts):
+    """The number of pieces each text splits into at its full stops (len(text.split("."))),
+    counted without building the pieces."""
+    return np.fromiter((text.count(".") + 1 for text in texts), dtype=np.int32, count=len(texts))
 
 
-def test_meditation_video_generator_live():
+def _with_retries(call, attempts=3):
+    """Calls call(), retrying with an exponential backoff (1 s, 2 s, ... at most 16 s)
+    if the API rate limits the request or can't be reached, so a transient error
+    doesn't fail the whole live test."""
+    for attempt in range(attempts):
+        try:
+            return call()
+        except (openai.RateLimitError, openai.APIConnectionError):
+            if attempt == attempts - 1:
+                raise
+            time.sleep(min(2 ** attempt, 16))
+
+
+@pytest.fixture
+def cached_chat(request, monkeypatch):
+    """Records the chat completions made by a test in the pytest cache (.pytest_cache)
+    and replays them when the test is run again, so re-runs make no chat API calls.
+    Requests are keyed on their arguments and on how many times the same request
+    has been made before, so repeated samples of one prompt stay different.
+    The generator puts randomly chosen parts (e.g. the technique) in its prompts, so
+    random is seeded for the test, to make the same prompts, and keys, every run."""
+    cache = getattr(request.config, "cache", None)
+    if cache is None:  # run with -p no:cacheprovider
+        yield
+        return
+    state = random.getstate()
+    random.seed(request.node.nodeid)
+    made = collections.Counter()
+
+    def cache_key(kwargs):
+        digest = hashlib.sha256(json.dumps(kwargs, sort_keys=True, default=str).encode()).hexdigest()
+        made[digest] += 1
+        return f"openai/{digest}_{made[digest]}"
+
+    create = openai.resources.chat.Completions.create
+    async_create = openai.resources.chat.AsyncCompletions.create
+
+    def cached_create(self, **kwargs):
+        key = cache_key(kwargs)
+        recorded = cache.get(key, None)
+        if recorded is None:
+            response = create(self, **kwargs)
+            cache.set(key, response.model_dump(mode="json"))
+            return response
+        return ChatCompletion.model_validate(recorded)
+
+    async def cached_async_create(self, **kwargs):
+        key = cache_key(kwargs)
+        recorded = cache.get(key, None)
+        if recorded is None:
+            response = await async_create(self, **kwargs)
+            cache.set(key, response.model_dump(mode="json"))
+            return response
+        return ChatCompletion.model_validate(recorded)
+
+    monkeypatch.setattr(openai.resources.chat.Completions, "create", cached_create)
+    monkeypatch.setattr(openai.resources.chat.AsyncCompletions, "create", cached_async_create)
+    yield
+    random.setstate(state)
+
+
+def test_meditation_video_generator_live(live, cached_chat, openai_client, tmp_path):
+    if not live:
+        pytest.skip("makes OpenAI API calls, run with --live")
 
     # 1. test size of tiny generated subsections
-    mvg = MeditationVideoGenerator(api_key=KEY, force_working_dir_overwrite=True,
+    mvg = MeditationVideoGenerator(api_key=KEY, client=openai_client, working_directory=str(tmp_path),
+                                   force_working_dir_overwrite=True,
                                    length=1, num_sentences=2, expand_on_section=False,
                                    limit_parts=1)
     # uses samples since gpt is non-deterministic
-    subsections_samples = []
     num_samples = 3
-    for samples in range(num_samples):
-        subsections = mvg.generate_meditation_texts()
-        subsections_samples.append(subsections)
+    subsections_samples = _with_retries(lambda: mvg.generate_meditation_texts(n_samples=num_samples))
     # calculate the mean length of the subsections
-    mean_length = np.mean([len(s) for s in subsections_samples])
+    mean_length = np.fromiter((len(s) for s in subsections_samples), dtype=np.int32,
+                              count=len(subsections_samples)).mean()
     # check there are approximately length+2 subsections
     assert 3 <= mean_length < 5
     # raise a warning if there are not limit_part + 2 subsections, but it's not fatal
-    if not sum([len(s) for s in subsections_samples]) != 3*num_samples:
+    if sum(len(s) for s in subsections_samples) == 3 * num_samples:
         print("Warning: There are not limit_part + 2 subsections. But there are ", [len(s) for s in subsections_samples])
     # check the average number of sentences across all subsections is approximately 2
     # join subsections_samples into one list of nums
     subsections = [item for sublist in subsections_samples for item in sublist]
-    assert 2 <= np.mean([len(s.split(".")) for s in subsections]) < 4
+    sentence_counts = _sentence_counts(subsections)
+    assert 2 <= sentence_counts.mean() < 4
 
     # 2. check that extended versions are longer.
-    prev_subsections = subsections
-    mvg = MeditationVideoGenerator(api_key=KEY, force_working_dir_overwrite=True,
-                                      length=1, num_sentences=1, expand_on_section=True, limit_parts=1)
-    subsections = mvg.generate_meditation_texts()
+    prev_sentence_counts = sentence_counts
+    mvg = MeditationVideoGenerator(api_key=KEY, client=openai_client, working_directory=str(tmp_path),
+                                   force_working_dir_overwrite=True,
+                                   length=1, num_sentences=1, expand_on_section=True, limit_parts=1)
+    subsections = _with_retries(mvg.generate_meditation_texts)
     # check that mean number of sentences is greater than before
-    assert np.mean([len(s.split(".")) for s in subsections]) > \
-           np.mean([len(s.split(".")) for s in prev_subsections])
+    assert _sentence_counts(subsections).mean() > prev_sentence_counts.mean()
 
 
     # 3. test size of larger generated subsections
-    mvg = MeditationVideoGenerator(api_key=KEY, force_working_dir_overwrite=True,
+    mvg = MeditationVideoGenerator(api_key=KEY, client=openai_client, working_directory=str(tmp_path),
+                                   force_working_dir_overwrite=True,
                                    length=2, num_sentences=3, expand_on_section=False, limit_parts=9)
     # uses samples since gpt is non-deterministic
-    subsections_samples = []
     num_samples = 3
-    for samples in range(num_samples):
-        subsections = mvg.generate_meditation_texts()
-        subsections_samples.append(subsections)
+    subsections_samples = _with_retries(lambda: mvg.generate_meditation_texts(n_samples=num_samples))
     # calculate the mean length of the subsections
-    mean_length = np.mean([len(s) for s in subsections_samples])
+    mean_length = np.fromiter((len(s) for s in subsections_samples), dtype=np.int32,
+                              count=len(subsections_samples)).mean()
     # check there are approximately length+2 subsections
     assert 7 <= mean_length < 11
     # raise a warning if there are not limit_part + 2 subsections, but it's not fatal
-    if not sum([len(s) for s in subsections_samples]) != 3 * num_samples:
+    if sum(len(s) for s in subsections_samples) == 3 * num_samples:
         print("Warning: There are not limit_part + 2 subsections. But there are ",
               [len(s) for s in subsections_samples])
     # check the average number of sentences across all subsections is approximately 3
     # join subsections_samples into one list of nums
     subsections = [item for sublist in subsections_samples for item in sublist]
-    assert 2 <= np.mean([len(s.split(".")) for s in subsections]) <= 4
+    assert 2 <= _sentence_counts(subsections).mean() <= 4
 
 
     # 4. check that doing an affirmation with free text works
-    mvg = MeditationVideoGenerator(api_key=KEY, force_working_dir_overwrite=True,
+    mvg = MeditationVideoGenerator(api_key=KEY, client=openai_client, working_directory=str(tmp_path),
+                                   force_working_dir_overwrite=True,
                                    affirmations_only=True)
     mvg.pipeline = {
         "texts": True
@@ -116,7 +167,8 @@ def test_meditation_video_generator_live():
     assert subsections[1] == "I am a kind person."
 
     # 5. check that num_loops works
-    mvg = MeditationVideoGenerator(api_key=KEY, force_working_dir_overwrite=True,
+    mvg = MeditationVideoGenerator(api_key=KEY, client=openai_client, working_directory=str(tmp_path),
+                                   force_working_dir_overwrite=True,
                                    num_loops=2)
     mvg.pipeline = {
             "texts": True,
@@ -126,246 +178,373 @@ def test_meditation_video_generator_live():
     assert len(mvg.subsection_audio_files) == 2 * 2
 
 
+def _mock_texts_response(num_parts, num_sentences, num_samples=1):
+    """A canned JSON mode response to the meditation prompt, with num_samples choices
+    that each have num_parts parts of num_sentences sentences."""
+    text = " ".join(["Breathe in slowly and let go."] * num_sentences)
+    content = json.dumps({"parts": [{f"meditation_part_{i + 1}": text} for i in range(num_parts)]})
+    return _as_namespace({"choices": [{"message": {"content": content}}] * num_samples})
 
-def test_meditation_video_generator_edge_cases():
-    mvg = MeditationVideoGenerator(api_key=KEY, force_working_dir_overwrite=True)
-    # create 3 silent audio files using audiosegment in working dir
-    for i in range(1,4):
-        AudioSegment.silent(duration=1000).export(f"fakefile{i}.mp3", format="mp3")
 
-    # 1. Error: send_prompt - Empty prompt.
-    with pytest.raises(ValueError, match="Error: send_prompt - Empty prompt."):
-        mvg.send_prompt("")
+def _assert_texts_request(mock_create, limit_parts, num_sentences=0, n_samples=1):
+    """Checks the request the generator made for its texts: a JSON mode prompt asking for at most
+    limit_parts parts of at most num_sentences sentences (0 when the sentences are not limited)."""
+    kwargs = mock_create.call_args.kwargs
+    prompt = kwargs["messages"][0]["content"]
+    assert kwargs["response_format"] == {"type": "json_object"}
+    assert kwargs.get("n", 1) == n_samples
+    assert f"NO MORE THAN {limit_parts} MEDITATION_PART JSON KEYS" in prompt
+    assert (f"no more than {num_sentences} sentences long" in prompt) == (num_sentences > 0)
+    assert (f"NO MORE THAN {num_sentences} SENTENCES LONG" in prompt) == (num_sentences > 0)
 
-    # 2. Error: send_prompt - JSON must be mentioned in a JSON prompt.
-    with pytest.raises(ValueError, match="Error: send_prompt - JSON must be mentioned in a JSON prompt."):
-        mvg.send_prompt("Hello", use_json=True)
 
-    # 3. Error: topic_based_filename is not set.
-    mvg.topic_based_filename = ""
-    with pytest.raises(ValueError, match="Error: topic_based_filename is not set."):
-        mvg.generate_meditation_texts()
+def test_meditation_video_generator_mocked(openai_client, tmp_path):
+    """The text checks of the live test, run against canned responses."""
+    # 1. test size of tiny generated subsections
+    mvg = MeditationVideoGenerator(api_key=KEY, client=openai_client, working_directory=str(tmp_path),
+                                   force_working_dir_overwrite=True,
+                                   length=1, num_sentences=2, expand_on_section=False,
+                                   limit_parts=1)
+    num_samples = 3
+    with patch.object(mvg.client.chat.completions, 'create',
+                      return_value=_mock_texts_response(3, 2, num_samples)) as mock_create:
+        subsections_samples = mvg.generate_meditation_texts(n_samples=num_samples)
+    # limit_parts is raised to 3, for the introduction and conclusion
+    _assert_texts_request(mock_create, limit_parts=3, num_sentences=2, n_samples=num_samples)
+    mean_length = np.fromiter((len(s) for s in subsections_samples), dtype=np.int32,
+                              count=len(subsections_samples)).mean()
+    assert 3 <= mean_length < 5
+    subsections = [item for sublist in subsections_samples for item in sublist]
+    sentence_counts = _sentence_counts(subsections)
+    assert 2 <= sentence_counts.mean() < 4
 
-    # 4. Error: generate_meditations_texts - Prompt is not set.
-    mvg.topic_based_filename = "test"
-    mvg.prompt = ""
-    with pytest.raises(ValueError, match="Error: generate_meditations_texts - Prompt is not set."):
-        mvg.generate_meditation_texts()
+    # 2. check that extended versions are longer.
+    mvg = MeditationVideoGenerator(api_key=KEY, client=openai_client, working_directory=str(tmp_path),
+                                   force_working_dir_overwrite=True,
+                                   length=1, num_sentences=1, expand_on_section=True, limit_parts=1)
+    with patch.object(mvg.client.chat.completions, 'create', return_value=_mock_texts_response(3, 5)) as mock_create:
+        subsections = mvg.generate_meditation_texts()
+    # the sentences are not limited when the sections are expanded on
+    _assert_texts_request(mock_create, limit_parts=3)
+    assert _sentence_counts(subsections).mean() > sentence_counts.mean()
+
+    # 3. test size of larger generated subsections
+    mvg = MeditationVideoGenerator(api_key=KEY, client=openai_client, working_directory=str(tmp_path),
+                                   force_working_dir_overwrite=True,
+                                   length=2, num_sentences=3, expand_on_section=False, limit_parts=9)
+    with patch.object(mvg.client.chat.completions, 'create',
+                      return_value=_mock_texts_response(9, 3, num_samples)) as mock_create:
+        subsections_samples = mvg.generate_meditation_texts(n_samples=num_samples)
+    _assert_texts_request(mock_create, limit_parts=9, num_sentences=3, n_samples=num_samples)
+    mean_length = np.fromiter((len(s) for s in subsections_samples), dtype=np.int32,
+                              count=len(subsections_samples)).mean()
+    assert 7 <= mean_length < 11
+    subsections = [item for sublist in subsections_samples for item in sublist]
+    assert 2 <= _sentence_counts(subsections).mean() <= 4
+
+    # 4. check that doing an affirmation with free text works (this makes no API calls)
+    mvg = MeditationVideoGenerator(api_key=KEY, client=openai_client, working_directory=str(tmp_path),
+                                   force_working_dir_overwrite=True,
+                                   affirmations_only=True)
+    mvg.pipeline = {
+        "texts": True
+    }
+    subsections, _ = mvg.run_meditation_pipeline(content="I am a good person.\n\nI am a kind person.")
+    assert subsections == ["I am a good person.", "I am a kind person."]
+
+
+def test_meditation_video_generator_keeps_given_working_directory(openai_client, tmp_path):
+    # Overwriting (or deleting the workspace in) a working_directory that was passed in only
+    # removes the files the generator writes, never the directory or anything else in it
+    (tmp_path / "keep.txt").write_text("not a meditation file")
+    (tmp_path / "keep").mkdir()
+    (tmp_path / "meditation_part_1.mp3").write_bytes(b"")
+    (tmp_path / "Mindfulness_meditation_text.json").write_text("[]")
+    mvg = MeditationVideoGenerator(topic="Mindfulness", client=openai_client, working_directory=str(tmp_path),
+                                   force_working_dir_overwrite=True)
+    assert sorted(os.listdir(tmp_path)) == ["keep", "keep.txt"]
+    (tmp_path / "meditation_part_2.mp3").write_bytes(b"")
+    mvg.delete_meditation_workspace()
+    assert sorted(os.listdir(tmp_path)) == ["keep", "keep.txt"]
+
+
+def test_meditation_video_generator_delete_workspace_errors(openai_client, tmp_path, monkeypatch, capsys):
+    # Files that cannot be deleted are reported, and the workspace is then not reported as deleted
+    real_unlink, real_remove = os.unlink, os.remove
+
+    def refuse(real):
+        def delete(path, *args, **kwargs):
+            if os.path.basename(path) == "meditation_part_1.mp3":
+                raise PermissionError(f"refused: {path}")
+            return real(path, *args, **kwargs)
+        return delete
+
+    monkeypatch.chdir(tmp_path)
+    given = tmp_path / "given"
+    given.mkdir()
+    # 1. the generator's own working directory (removed with rmtree) and 2. one that was passed in
+    for working_directory in ["", str(given)]:
+        mvg = MeditationVideoGenerator(topic="Mindfulness", client=openai_client,
+                                       working_directory=working_directory, force_working_dir_overwrite=True)
+        for name in ["meditation_part_1.mp3", "meditation_part_2.mp3"]:
+            with open(os.path.join(mvg.working_directory, name), "wb"):
+                pass
+        capsys.readouterr()
+        with monkeypatch.context() as mp:
+            mp.setattr(os, "unlink", refuse(real_unlink))
+            mp.setattr(os, "remove", refuse(real_remove))
+            mvg.delete_meditation_workspace()
+        out = capsys.readouterr().out
+        assert "Error deleting file: refused:" in out
+        assert "Could not delete all of the meditation workspace" in out
+        assert "Deleted meditation workspace" not in out
+        assert os.listdir(mvg.working_directory) == ["meditation_part_1.mp3"]
+        # once the file can go, the workspace is deleted
+        mvg.delete_meditation_workspace()
+        assert "Deleted meditation workspace" in capsys.readouterr().out
+
+
+@pytest.fixture(scope="module")
+def mvg_shared(tmp_path_factory, silent_mp3, openai_client):
+    """One generator shared by the edge case tests. Each test only changes the attributes
+    it needs with monkeypatch, so they are restored again afterwards. It is made in a
+    temporary directory of its own, so test processes running in parallel (pytest-xdist)
+    don't share any files."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(tmp_path_factory.mktemp("edge_cases"))
+        mvg = MeditationVideoGenerator(api_key=KEY, force_working_dir_overwrite=True, client=openai_client)
+        # create 3 silent audio files in working dir, all links to the same silent MP3
+        for i in range(1, 4):
+            try:
+                os.link(silent_mp3, f"fakefile{i}.mp3")
+            except OSError:  # no hard links on this file system
+                shutil.copyfile(silent_mp3, f"fakefile{i}.mp3")
+        yield mvg
 
-    mock_return_value_content = """[
+
+@pytest.fixture
+def mvg(mvg_shared, monkeypatch, tmp_path):
+    """The shared generator, with a new empty working directory for each test."""
+    monkeypatch.setattr(mvg_shared, "working_directory", str(tmp_path))
+    return mvg_shared
+
+
+# mock chat completions, built once for all the tests
+MOCK_TEXTS_CONTENT = """[
             {"meditation_part_1": "The first part of the meditation text."},
             {"meditation_part_2": "The second part of the meditation text."},
             {"meditation_part_3": "The third part of the meditation text."}
         ]
     """
-    mock_return_value_content = mock_return_value_content.replace("'", '"')
-    mock_return_value = {
-        "choices": [
-            {
-                "message": {
-                    "content": mock_return_value_content
-                }
-            }
-        ]
-    }
-
-    mock_return_value = DotDict(mock_return_value)
-    openai.api_key = "mock_key"
-
+MOCK_TEXTS_RESPONSE = _as_namespace({"choices": [{"message": {"content": MOCK_TEXTS_CONTENT}}]})
+# a JSON mode response, with the parts wrapped in a "parts" object
+MOCK_JSON_MODE_RESPONSE = _as_namespace({"choices": [{"message": {"content": '{"parts": ' + MOCK_TEXTS_CONTENT + '}'}}]})
+# a response with two choices (n=2)
+MOCK_SAMPLES_RESPONSE = _as_namespace({"choices": [{"message": {"content": MOCK_TEXTS_CONTENT}},
+                                                   {"message": {"content": '{"parts": ' + MOCK_TEXTS_CONTENT + '}'}}]})
+MOCK_KEYWORDS_RESPONSE = _as_namespace({"choices": [
+    {"message": {"content": "keyword1, keyword2, keyword3, keyword4, keyword5"}}]})
+MOCK_TRANSLATION_RESPONSE = _as_namespace({"choices": [{"message": {"content": "uno, dos, tres"}}]})
+
+SUBSECTIONS = ["The first part of the meditation text.", "The second part of the meditation text.",
+               "The third part of the meditation text."]
+
+# (attribute overrides, method, keyword arguments, expected exception, expected message)
+EDGE_CASES = [
+    # 1. Error: send_prompt - Empty prompt.
+    pytest.param({}, "send_prompt", {"prompt": ""}, ValueError, "Error: send_prompt - Empty prompt.", id="send_prompt_empty"),
+    # 2. Error: send_prompt - JSON must be mentioned in a JSON prompt.
+    pytest.param({}, "send_prompt", {"prompt": "Hello", "use_json": True}, ValueError,
+                 "Error: send_prompt - JSON must be mentioned in a JSON prompt.", id="send_prompt_json_not_mentioned"),
+    # 2.5. Error: send_prompt - n_samples must be at least 1.
+    pytest.param({}, "send_prompt", {"prompt": "Hello", "n_samples": 0}, ValueError,
+                 "Error: send_prompt - n_samples must be at least 1.", id="send_prompt_no_samples"),
+    # 3. Error: topic_based_filename is not set.
+    pytest.param({"topic_based_filename": ""}, "generate_meditation_texts", {}, ValueError,
+                 "Error: topic_based_filename is not set.", id="texts_no_topic_based_filename"),
+    # 4. Error: generate_meditations_texts - Prompt is not set.
+    pytest.param({"topic_based_filename": "test", "prompt": ""}, "generate_meditation_texts", {}, ValueError,
+                 "Error: generate_meditations_texts - Prompt is not set.", id="texts_no_prompt"),
     # 5. Error: generate_meditations_texts - JSON must be mentioned in a JSON prompt.
-    mvg.prompt = "Hello"
-    with pytest.raises(ValueError, match="Error: generate_meditations_texts - JSON must be mentioned in a JSON prompt."):
-        mvg.generate_meditation_texts()
-
+    pytest.param({"topic_based_filename": "test", "prompt": "Hello"}, "generate_meditation_texts", {}, ValueError,
+                 "Error: generate_meditations_texts - JSON must be mentioned in a JSON prompt.", id="texts_json_not_mentioned"),
     # 7 Error: generate_meditations_texts - working_directory does not exist
-    mvg = MeditationVideoGenerator(num_sentences=1, limit_parts=2, length=2, api_key=KEY, topic="Mindfulness", force_working_dir_overwrite=True)
-    with patch.object(mvg.client.chat.completions, 'create', return_value=mock_return_value):
-        mvg.working_directory = "i_do_not_exist"
-        with pytest.raises(FileNotFoundError, match="Error: generate_meditations_texts - working_directory does not exist"):
-            mvg.generate_meditation_texts()
-
-    # 8 Generate a meditation text with mock value has 3 subsections
-    mvg = MeditationVideoGenerator(length=2, api_key="mock_key", force_working_dir_overwrite=True)
-    with patch.object(mvg.client.chat.completions, 'create', return_value=mock_return_value):
-        result = mvg.generate_meditation_texts()
-        assert len(result) == 3
-
+    pytest.param({"working_directory": "i_do_not_exist"}, "generate_meditation_texts", {}, FileNotFoundError,
+                 "Error: generate_meditations_texts - working_directory does not exist", id="texts_no_working_directory"),
     # 9. Error: synthesize_speech - Empty text.
-    with pytest.raises(ValueError, match="Error: synthesize_speech - Empty text."):
-        mvg.synthesize_speech(text="", filename="Mindfulness_1.mp3")
-
+    pytest.param({}, "synthesize_speech", {"text": "", "filename": "Mindfulness_1.mp3"}, ValueError,
+                 "Error: synthesize_speech - Empty text.", id="speech_empty_text"),
     # 10. Error: synthesize_speech - Empty filename.
-    with pytest.raises(ValueError, match="Error: synthesize_speech - Empty filename."):
-        mvg.synthesize_speech(text="Hello", filename="")
-
+    pytest.param({}, "synthesize_speech", {"text": "Hello", "filename": ""}, ValueError,
+                 "Error: synthesize_speech - Empty filename.", id="speech_empty_filename"),
     # 11. Error: synthesize_speech - Filename must end with .mp3.
-    with pytest.raises(ValueError, match="Error: synthesize_speech - Filename must end with .mp3."):
-        mvg.synthesize_speech(text="Hello", filename="Mindfulness_1")
-
+    pytest.param({}, "synthesize_speech", {"text": "Hello", "filename": "Mindfulness_1"}, ValueError,
+                 "Error: synthesize_speech - Filename must end with .mp3.", id="speech_not_mp3"),
     # 12. Error: create_meditation_text_audio_files - Subsections are not set.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    with pytest.raises(ValueError, match="Error: create_meditation_text_audio_files - Subsections are not set."):
-        mvg.create_meditation_text_audio_files()
-
+    pytest.param({}, "create_meditation_text_audio_files", {}, ValueError,
+                 "Error: create_meditation_text_audio_files - Subsections are not set.", id="audio_files_no_subsections"),
     # 13. Error: create_meditation_text_audio_files - working_directory does not exist:
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.working_directory = "i_do_not_exist"
-    mvg.subsections = ["The first part of the meditation text.", "The second part of the meditation text.", "The third part of the meditation text."]
-    with pytest.raises(FileNotFoundError, match="Error: create_meditation_text_audio_files - working_directory does not exist"):
-        mvg.create_meditation_text_audio_files()
-
+    pytest.param({"working_directory": "i_do_not_exist", "subsections": SUBSECTIONS}, "create_meditation_text_audio_files", {},
+                 FileNotFoundError, "Error: create_meditation_text_audio_files - working_directory does not exist", id="audio_files_no_working_directory"),
     # 14. Error: create_meditation_text_audio_files - voice_even is not set.
-    with patch.object(mvg.client.audio.speech, 'create'):
-        mvg = MeditationVideoGenerator(force_working_dir_overwrite=True, two_voices=True)
-        mvg.voice_even = ""
-        mvg.subsections = ["The first part of the meditation text.", "The second part of the meditation text.", "The third part of the meditation text."]
-        with pytest.raises(ValueError, match="Error: create_meditation_text_audio_files - voice_even is not set."):
-            mvg.create_meditation_text_audio_files()
-
+    pytest.param({"two_voices": True, "voice_odd": "onyx", "voice_even": "", "subsections": SUBSECTIONS},
+                 "create_meditation_text_audio_files", {}, ValueError,
+                 "Error: create_meditation_text_audio_files - voice_even is not set.", id="audio_files_no_voice_even"),
     # 15. Error: create_meditation_text_audio_files - voice_odd is not set.
-    with patch.object(mvg.client.audio.speech, 'create'):
-        mvg = MeditationVideoGenerator(force_working_dir_overwrite=True, two_voices=True)
-        mvg.voice_odd = ""
-        mvg.subsections = ["The first part of the meditation text.", "The second part of the meditation text.", "The third part of the meditation text."]
-        with pytest.raises(ValueError, match="Error: create_meditation_text_audio_files - voice_odd is not set."):
-            mvg.create_meditation_text_audio_files()
-
+    pytest.param({"two_voices": True, "voice_odd": "", "voice_even": "shimmer", "subsections": SUBSECTIONS},
+                 "create_meditation_text_audio_files", {}, ValueError,
+                 "Error: create_meditation_text_audio_files - voice_odd is not set.", id="audio_files_no_voice_odd"),
+    # 15.5. Error: create_meditation_text_audio_files - tts_max_workers must be at least 1.
+    pytest.param({"tts_max_workers": 0, "subsections": SUBSECTIONS[:2]}, "create_meditation_text_audio_files", {}, ValueError,
+                 "Error: create_meditation_text_audio_files - tts_max_workers must be at least 1.", id="audio_files_no_tts_workers"),
     # test merge_mediation_audio
     # 16. Error: merge_meditation_audio - working_directory does not exist:
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.working_directory = "i_do_not_exist"
-    with pytest.raises(FileNotFoundError, match="Error: merge_meditation_audio - working_directory does not exist"):
-        mvg.merge_meditation_audio()
-
+    pytest.param({"working_directory": "i_do_not_exist"}, "merge_meditation_audio", {}, FileNotFoundError,
+                 "Error: merge_meditation_audio - working_directory does not exist", id="merge_no_working_directory"),
     # 16.5: Error: merge_meditation_audio - No files in list and none found to merge.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    with pytest.raises(ValueError, match="Error: merge_meditation_audio - No files in list and none found to merge."):
-        mvg.merge_meditation_audio()
-
+    pytest.param({}, "merge_meditation_audio", {}, ValueError,
+                 "Error: merge_meditation_audio - No files in list and none found to merge.", id="merge_no_files"),
     # 17. Error: merge_meditation_audio - Empty topic_based_filename.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.topic_based_filename = ""
-    mvg.subsection_audio_files = ["fakefile1.mp3", "fakefile2.mp3", "fakefile3.mp3"]
-    with pytest.raises(ValueError, match="Error: merge_meditation_audio - Empty topic_based_filename."):
-        mvg.merge_meditation_audio()
-
+    pytest.param({"topic_based_filename": "", "subsection_audio_files": ["fakefile1.mp3", "fakefile2.mp3", "fakefile3.mp3"]},
+                 "merge_meditation_audio", {}, ValueError, "Error: merge_meditation_audio - Empty topic_based_filename.", id="merge_no_topic_based_filename"),
     # add_audio_fx
     # 17. Error: add_audio_fx - working_directory does not exist:
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.working_directory = "i_do_not_exist"
-    with pytest.raises(FileNotFoundError, match="Error: add_audio_fx - working_directory does not exist"):
-        mvg.add_audio_fx()
-
+    pytest.param({"working_directory": "i_do_not_exist"}, "add_audio_fx", {}, FileNotFoundError,
+                 "Error: add_audio_fx - working_directory does not exist", id="audio_fx_no_working_directory"),
     # 18. Error: add_audio_fx - Empty topic_based_filename.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.topic_based_filename = ""
-    with pytest.raises(ValueError, match="Error: add_audio_fx - Empty topic_based_filename."):
-        mvg.add_audio_fx()
-
+    pytest.param({"topic_based_filename": ""}, "add_audio_fx", {}, ValueError, "Error: add_audio_fx - Empty topic_based_filename.", id="audio_fx_no_topic_based_filename"),
     # 19. meditation_text_merged.mp3 does not exist in working directory.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    with pytest.raises(FileNotFoundError, match="meditation_text_merged.mp3 does not exist in working directory"):
-        mvg.add_audio_fx()
-
+    pytest.param({}, "add_audio_fx", {}, FileNotFoundError, "meditation_text_merged.mp3 does not exist in working directory", id="audio_fx_no_merged_file"),
     # mix_meditation_audio
     # 20. Error: mix_meditation_audio - working_directory does not exist:
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.working_directory = "i_do_not_exist"
-    with pytest.raises(FileNotFoundError, match="Error: mix_meditation_audio - working_directory does not exist"):
-        mvg.mix_meditation_audio()
-
+    pytest.param({"working_directory": "i_do_not_exist"}, "mix_meditation_audio", {}, FileNotFoundError,
+                 "Error: mix_meditation_audio - working_directory does not exist", id="mix_no_working_directory"),
     # 21. Error: mix_meditation_audio - Empty topic_based_filename.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.topic_based_filename = ""
-    with pytest.raises(ValueError, match="Error: mix_meditation_audio - Empty topic_based_filename."):
-        mvg.mix_meditation_audio()
-
+    pytest.param({"topic_based_filename": ""}, "mix_meditation_audio", {}, ValueError,
+                 "Error: mix_meditation_audio - Empty topic_based_filename.", id="mix_no_topic_based_filename"),
     # 22. _meditation_text_merged_fx.mp3 does not exist in working directory.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    with pytest.raises(FileNotFoundError, match="_meditation_text_merged_fx.mp3 does not exist in working directory"):
-        mvg.mix_meditation_audio()
-
+    pytest.param({}, "mix_meditation_audio", {}, FileNotFoundError,
+                 "_meditation_text_merged_fx.mp3 does not exist in working directory", id="mix_no_fx_file"),
     # 23 Error: generate_meditation_image - Empty image_model.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.image_model = ""
-    with pytest.raises(ValueError, match="Error: generate_meditation_image - Empty image_model."):
-        mvg.generate_meditation_image()
-
+    pytest.param({"image_model": ""}, "generate_meditation_image", {}, ValueError,
+                 "Error: generate_meditation_image - Empty image_model.", id="image_no_model"),
     # 24 Error: generate_meditation_image - Empty image_prompt.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.image_model = "fakemodel"
-    mvg.image_prompt = ""
-    with pytest.raises(ValueError, match="Error: generate_meditation_image - Empty image_prompt."):
-        mvg.generate_meditation_image()
-
+    pytest.param({"image_model": "fakemodel", "image_prompt": ""}, "generate_meditation_image", {}, ValueError,
+                 "Error: generate_meditation_image - Empty image_prompt.", id="image_no_prompt"),
     # 25 Error: generate_meditation_image - Empty image_quality.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.image_model = "fakemodel"
-    mvg.image_prompt = "fakeprompt"
-    mvg.image_quality = ""
-    with pytest.raises(ValueError, match="Error: generate_meditation_image - Empty image_quality."):
-        mvg.generate_meditation_image()
-
+    pytest.param({"image_model": "fakemodel", "image_prompt": "fakeprompt", "image_quality": ""}, "generate_meditation_image", {},
+                 ValueError, "Error: generate_meditation_image - Empty image_quality.", id="image_no_quality"),
     # 26 Error: generate_meditation_image - working_directory does not exist:
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.working_directory = "i_do_not_exist"
-    with pytest.raises(FileNotFoundError, match="Error: generate_meditation_image - working_directory does not exist"):
-        mvg.generate_meditation_image()
-
+    pytest.param({"working_directory": "i_do_not_exist"}, "generate_meditation_image", {}, FileNotFoundError,
+                 "Error: generate_meditation_image - working_directory does not exist", id="image_no_working_directory"),
     # 27. Error: generate_meditation_image - Empty topic_based_filename.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.topic_based_filename = ""
-    with pytest.raises(ValueError, match="Error: generate_meditation_image - Empty topic_based_filename."):
-        mvg.generate_meditation_image()
-
+    pytest.param({"topic_based_filename": ""}, "generate_meditation_image", {}, ValueError,
+                 "Error: generate_meditation_image - Empty topic_based_filename.", id="image_no_topic_based_filename"),
     # 28. Error: generate_meditation_image - OpenAI API call failed
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.image_model = "fakemodel"
-    mvg.image_prompt = "fakeprompt"
-    mvg.image_quality = "fakequality"
-    with pytest.raises(RuntimeError, match="Error: generate_meditation_image - OpenAI API call failed"):
-        mvg.generate_meditation_image()
-
+    pytest.param({"image_model": "fakemodel", "image_prompt": "fakeprompt", "image_quality": "fakequality"},
+                 "generate_meditation_image", {}, RuntimeError, "Error: generate_meditation_image - OpenAI API call failed", id="image_api_call_failed"),
     # create_meditation_video
     # 29. Error: create_meditation_video - working_directory does not exist:
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.working_directory = "i_do_not_exist"
-    with pytest.raises(FileNotFoundError, match="Error: create_meditation_video - working_directory does not exist"):
-        mvg.create_meditation_video()
-
+    pytest.param({"working_directory": "i_do_not_exist"}, "create_meditation_video", {}, FileNotFoundError,
+                 "Error: create_meditation_video - working_directory does not exist", id="video_no_working_directory"),
     # 30. Error: create_meditation_video - Empty topic_based_filename.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.topic_based_filename = ""
-    with pytest.raises(ValueError, match="Error: create_meditation_video - Empty topic_based_filename."):
-        mvg.create_meditation_video()
-
+    pytest.param({"topic_based_filename": ""}, "create_meditation_video", {}, ValueError,
+                 "Error: create_meditation_video - Empty topic_based_filename.", id="video_no_topic_based_filename"),
     # 31. _meditation_image.jpg does not exist.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    with pytest.raises(FileNotFoundError, match="_meditation_image.jpg does not exist."):
-        mvg.create_meditation_video()
-
-    # 32. _meditation_text_merged_fx_mixed.mp3 does not exist.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    # create trivial Mindfulness_meditation_image.jpg file in working directory
-    # has to be a loadable jpeg file
-    # use moviepy to write a black pixel image
-    black_pixel = np.zeros((1, 1, 3), dtype=np.uint8)
-    black_pixel[0, 0] = [0, 0, 0]
-    black_pixel = ImageClip(black_pixel)
-    black_pixel.save_frame(os.path.join(mvg.working_directory, "Mindfulness_meditation_image.jpg"))
-    with pytest.raises(FileNotFoundError, match="_meditation_text_merged_fx_mixed.mp3 does not exist."):
-        mvg.create_meditation_video()
-
+    pytest.param({}, "create_meditation_video", {}, FileNotFoundError, "_meditation_image.jpg does not exist.", id="video_no_image"),
     # 33. Error: run_meditation_pipeline - Empty free_text list.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    with pytest.raises(ValueError, match="Error: run_meditation_pipeline - Empty free_text list."):
-        mvg.run_meditation_pipeline(content=" ")
+    pytest.param({}, "run_meditation_pipeline", {"content": " "}, ValueError, "Error: run_meditation_pipeline - Empty free_text list.", id="pipeline_empty_free_text"),
+    # 35. Error: generate_keywords - num_keywords must be a positive integer.
+    pytest.param({}, "generate_keywords", {"num_keywords": -1}, ValueError,
+                 "Error: generate_keywords - num_keywords must be a positive integer.", id="keywords_not_positive"),
+    # 36. Error: translate_text - text must be a non-empty string.
+    pytest.param({}, "translate_text", {"text": " "}, ValueError, "Error: translate_text - text must be a non-empty string.", id="translate_empty_text"),
+    # 37. Error: translate_text - target_language must be a non-empty string.
+    pytest.param({}, "translate_text", {"text": "test", "target_language": " "}, ValueError,
+                 "Error: translate_text - target_language must be a non-empty string.", id="translate_empty_language"),
+    # TESTS OF THE BANNER GENERATION SYSTEM
+    # 38. Check add_banner_with_text() raises for invalid image_path f"Error: add_banner_with_text - Image file does not exist: {image_path}"
+    pytest.param({}, "add_banner_with_text", {"image_path": "i_do_not_exist.jpg", "banner_text": "test", "output_path": "output.jpg"},
+                 FileNotFoundError, "Error: add_banner_with_text - Image file does not exist: i_do_not_exist.jpg", id="banner_no_image"),
+]
+
+
+@pytest.mark.parametrize("overrides, method, kwargs, expected_exc, match", EDGE_CASES)
+def test_meditation_video_generator_edge_cases(mvg, monkeypatch, overrides, method, kwargs, expected_exc, match):
+    for attribute, value in overrides.items():
+        monkeypatch.setattr(mvg, attribute, value, raising=False)
+    with pytest.raises(expected_exc, match=match):
+        getattr(mvg, method)(**kwargs)
+
+
+@pytest.fixture
+def mock_chat(mvg, monkeypatch):
+    """Replaces the chat completions of the shared generator's client with one mock for
+    the whole test. It returns MOCK_TEXTS_RESPONSE until the test sets another return_value."""
+    mock = MagicMock(return_value=MOCK_TEXTS_RESPONSE)
+    monkeypatch.setattr(mvg.client.chat.completions, "create", mock)
+    return mock
+
+
+# (raw LLM response, expected parse); the parts are a list of {"meditation_part_<n>": text} objects
+PARSE_LLM_JSON_CASES = [
+    pytest.param('[{"meditation_part_1": "One."}]', [{"meditation_part_1": "One."}], id="plain_json"),
+    # prose and a code fence around the JSON
+    pytest.param('Here is your meditation:\n```json\n{"parts": [{"meditation_part_1": "One."}]}\n```\nEnjoy!',
+                 {"parts": [{"meditation_part_1": "One."}]}, id="prose_and_fences"),
+    # the array is the outermost bracket slice, even though it contains objects
+    pytest.param('Sure! [{"meditation_part_1": "One."}, {"meditation_part_2": "Two."}] Hope this helps.',
+                 [{"meditation_part_1": "One."}, {"meditation_part_2": "Two."}], id="bracket_slice"),
+    # Python literals rather than strict JSON
+    pytest.param("[{'meditation_part_1': 'One.'}, {'meditation_part_2': 'Two.'}]",
+                 [{"meditation_part_1": "One."}, {"meditation_part_2": "Two."}], id="single_quotes"),
+    pytest.param("The JSON: {'parts': [{'meditation_part_1': 'One.'}], 'done': True, 'notes': None}",
+                 {"parts": [{"meditation_part_1": "One."}], "done": True, "notes": None}, id="python_literals"),
+]
+
+
+@pytest.mark.parametrize("text, expected", PARSE_LLM_JSON_CASES)
+def test_meditation_video_generator_parse_llm_json(text, expected):
+    assert MeditationVideoGenerator._parse_llm_json(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    pytest.param("I am sorry, I cannot help with that.", id="no_json"),
+    pytest.param('[{"meditation_part_1": "One."', id="truncated"),
+    # code is never evaluated
+    pytest.param("[__import__('os').getcwd()]", id="code"),
+])
+def test_meditation_video_generator_parse_llm_json_errors(text):
+    with pytest.raises(ValueError, match="Error: _parse_llm_json - Could not parse the response as JSON."):
+        MeditationVideoGenerator._parse_llm_json(text)
+
+
+def test_meditation_video_generator_mock_responses(mvg, mock_chat, monkeypatch, tmp_path):
+    # generating texts stores them on the generator, so put the subsections back afterwards
+    monkeypatch.setattr(mvg, "subsections", [])
+    # 8 Generate a meditation text with mock value has 3 subsections
+    monkeypatch.setattr(mvg, "length", 2)
+    result = mvg.generate_meditation_texts()
+    assert len(result) == 3
+
+    # 8.5. Generate a meditation text from a JSON mode response wrapped in a "parts" object
+    mock_chat.return_value = MOCK_JSON_MODE_RESPONSE
+    result = mvg.generate_meditation_texts()
+    assert len(result) == 3
+    assert mock_chat.call_args.kwargs["response_format"] == {"type": "json_object"}
+
+    # 8.6. Generate several meditation texts in a single request with n_samples
+    mock_chat.reset_mock()
+    mock_chat.return_value = MOCK_SAMPLES_RESPONSE
+    result = mvg.generate_meditation_texts(n_samples=2)
+    assert [len(sample) for sample in result] == [3, 3]
+    assert mock_chat.call_count == 1
+    assert mock_chat.call_args.kwargs["n"] == 2
 
     # 34. Error: run_meditation_pipeline - Empty topic. (spanish translating pipeline)
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    mvg.in_spanish = True
-    mvg.topic = ""
-    mvg.pipeline = {
+    monkeypatch.setattr(mvg, "in_spanish", True)
+    monkeypatch.setattr(mvg, "topic", "")
+    monkeypatch.setattr(mvg, "pipeline", {
         "texts": False,
         "audio_files": False,
         "combine_audio_files": False,
@@ -374,104 +553,192 @@ def test_meditation_video_generator_edge_cases():
         "image": False,
         "keywords": True,
         "video": False
-    }
-
-    mock_return_value = {
-        "choices": [
-            {
-                "message": {
-                    "content": "keyword1, keyword2, keyword3, keyword4, keyword5",
-                }
-            }
-        ]
-    }
-    mock_return_value = DotDict(mock_return_value)
-    with patch.object(mvg.client.chat.completions, 'create', return_value=mock_return_value):
-        with pytest.raises(ValueError, match="Error: run_meditation_pipeline - Empty topic."):
-            mvg.run_meditation_pipeline()
-
-    # 35. Error: generate_keywords - num_keywords must be a positive integer.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    with pytest.raises(ValueError, match="Error: generate_keywords - num_keywords must be a positive integer."):
-        mvg.generate_keywords(num_keywords=-1)
-
-    # 36. Error: translate_text - text must be a non-empty string.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    with pytest.raises(ValueError, match="Error: translate_text - text must be a non-empty string."):
-        mvg.translate_text(text=" ")
-
-    # 37. Error: translate_text - target_language must be a non-empty string.
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    with pytest.raises(ValueError, match="Error: translate_text - target_language must be a non-empty string."):
-        mvg.translate_text(text="test", target_language=" ")
+    })
+    mock_chat.return_value = MOCK_KEYWORDS_RESPONSE
+    with pytest.raises(ValueError, match="Error: run_meditation_pipeline - Empty topic."):
+        mvg.run_meditation_pipeline()
+
+    # 37.5. translate_keywords translates all the keywords with a single request
+    mock_chat.reset_mock()
+    mock_chat.return_value = MOCK_TRANSLATION_RESPONSE
+    assert mvg.translate_keywords(["one", "two", "three"]) == ["uno", "dos", "tres"]
+    assert mock_chat.call_count == 1
+
+    # 37.6. If the batch translation has the wrong number of terms, each keyword is translated
+    # on its own, through the client the generator was given
+    def translate(**kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        if "<TERMS>" in prompt:
+            return _as_namespace({"choices": [{"message": {"content": "uno, dos"}}]})
+        word = prompt.split("<TEXT>'")[1].split("'</TEXT>")[0]
+        return _as_namespace({"choices": [{"message": {"content": {"one": "uno", "two": "dos", "three": "tres"}[word]}}]})
+
+    mock_chat.reset_mock()
+    mock_chat.side_effect = translate
+    assert mvg.translate_keywords(["one", "two", "three"]) == ["uno", "dos", "tres"]
+    assert mock_chat.call_count == 4
+
+    # 37.7. The banner summary of a topic is cached in summary_cache_dir, unless ignore_summary_cache
+    mock_chat.side_effect = None
+    mock_chat.reset_mock()
+    mock_chat.return_value = _as_namespace({"choices": [{"message": {"content": "Calm mind"}}]})
+    monkeypatch.setattr(mvg, "summary_cache_dir", str(tmp_path / "summaries"))
+    assert mvg._banner_summary() == "Calm mind"
+    assert mvg._banner_summary() == "Calm mind"
+    assert mock_chat.call_count == 1
+    monkeypatch.setattr(mvg, "ignore_summary_cache", True)
+    assert mvg._banner_summary() == "Calm mind"
+    assert mock_chat.call_count == 2
+
+
+def _mock_speech(is_async=False):
+    """A mock of a client's audio.speech.with_streaming_response.create, writing a fake MP3."""
+    def stream_to_file(path):
+        with open(path, "wb") as f:
+            f.write(b"fake mp3")
+    create = MagicMock()
+    response = create.return_value.__aenter__.return_value = create.return_value.__enter__.return_value
+    if is_async:  # the async client's stream_to_file is awaited
+        response.stream_to_file = AsyncMock(side_effect=stream_to_file)
+    else:
+        response.stream_to_file.side_effect = stream_to_file
+    return create
+
+
+def test_meditation_video_generator_tts_cache(mvg, monkeypatch, tmp_path):
+    monkeypatch.setattr(mvg, "tts_cache_dir", str(tmp_path / "tts"))
+    monkeypatch.setattr(mvg, "ignore_tts_cache", False)
+    part_1 = os.path.join(mvg.working_directory, "meditation_part_1.mp3")
+    part_2 = os.path.join(mvg.working_directory, "meditation_part_2.mp3")
+    create = _mock_speech()
+    monkeypatch.setattr(mvg.client.audio.speech.with_streaming_response, "create", create)
+
+    # 45. The same text is synthesized once, later parts just link to the cached audio
+    mvg.synthesize_speech("Breathe in.", part_1, voice="onyx")
+    mvg.synthesize_speech("Breathe in.", part_2, voice="onyx")
+    assert create.call_count == 1
+    cache_path = mvg._speech_cache_path("Breathe in.", part_1, "onyx")[2]
+    # the part files are hardlinks to the cache entry, not copies
+    assert os.stat(part_1).st_ino == os.stat(part_2).st_ino == os.stat(cache_path).st_ino
+
+    # 46. A different voice is a different cache entry
+    mvg.synthesize_speech("Breathe in.", part_2, voice="shimmer")
+    assert create.call_count == 2
+
+    # 47. ignore_tts_cache synthesizes again
+    monkeypatch.setattr(mvg, "ignore_tts_cache", True)
+    mvg.synthesize_speech("Breathe in.", part_1, voice="onyx")
+    assert create.call_count == 3
+    monkeypatch.setattr(mvg, "ignore_tts_cache", False)
+
+    # 48. The async synthesis shares the cache with synthesize_speech, both ways
+    async_create = _mock_speech(is_async=True)
+    async_client = MagicMock()
+    async_client.audio.speech.with_streaming_response.create = async_create
+    asyncio.run(mvg._async_synthesize_speech(async_client, "Breathe in.", part_1, voice="onyx"))
+    assert async_create.call_count == 0
+    asyncio.run(mvg._async_synthesize_speech(async_client, "Breathe out.", part_1, voice="onyx"))
+    assert async_create.call_count == 1
+    mvg.synthesize_speech("Breathe out.", part_2, voice="onyx")
+    assert create.call_count == 3
+    assert os.stat(part_1).st_ino == os.stat(part_2).st_ino
+
+
+def test_meditation_video_generator_async_client():
+    # The async clients made for batch synthesis and translation retry and pool connections
+    # the same way as the shared client
+    from meditation_video_generator.meditation_video_generator import _async_openai, _shared_openai
+
+    def settings(client):
+        pool = client._client._transport._pool
+        return client.max_retries, pool._max_connections, pool._max_keepalive_connections
+
+    async def async_settings():
+        async with _async_openai("sk-fake") as client:
+            return settings(client)
+
+    assert asyncio.run(async_settings()) == settings(_shared_openai("sk-fake")) == (5, 64, 32)
+
+
+def test_meditation_video_generator_pipeline_errors(mvg, monkeypatch):
+    monkeypatch.setattr(mvg, "pipeline", {"audio_files": True, "combine_audio_files": True, "image": True})
+    monkeypatch.setattr(mvg, "subsections", SUBSECTIONS)
+    image_failed = threading.Event()
+
+    def failing_image():
+        try:
+            raise RuntimeError("Error: generate_meditation_image - rejected by the content filter")
+        finally:
+            image_failed.set()
+
+    def first_audio_stage():
+        image_failed.wait(10)
+        time.sleep(0.1)  # the error is raised just after the event is set
+
+    # 44.5. An image error stops the pipeline before the next audio stage, not after all of them
+    merge = MagicMock()
+    monkeypatch.setattr(mvg, "generate_meditation_image", failing_image)
+    monkeypatch.setattr(mvg, "create_meditation_text_audio_files", first_audio_stage)
+    monkeypatch.setattr(mvg, "merge_meditation_audio", merge)
+    with pytest.raises(RuntimeError, match="content filter"):
+        mvg.run_meditation_pipeline()
+    merge.assert_not_called()
+
+    # 44.6. An audio error is raised straight away, without waiting for the image to finish
+    image_release = threading.Event()
+    monkeypatch.setattr(mvg, "generate_meditation_image", lambda: image_release.wait(10))
+    monkeypatch.setattr(mvg, "create_meditation_text_audio_files", MagicMock(side_effect=ValueError("audio failed")))
+    start = time.monotonic()
+    with pytest.raises(ValueError, match="audio failed"):
+        mvg.run_meditation_pipeline()
+    assert time.monotonic() - start < 5
+    image_release.set()
+
+
+def test_meditation_video_generator_image_files(mvg):
+    image_path = os.path.join(mvg.working_directory, "Mindfulness_meditation_image.jpg")
+    # 32. _meditation_text_merged_fx_mixed.mp3 does not exist.
+    # create trivial Mindfulness_meditation_image.jpg file in working directory
+    # has to be a loadable jpeg file
+    # use Pillow to write a black pixel image
+    black_pixel = np.zeros((1, 1, 3), dtype=np.uint8)
+    black_pixel[0, 0] = [0, 0, 0]
+    Image.fromarray(black_pixel).save(image_path, format="JPEG")
+    with pytest.raises(FileNotFoundError, match="_meditation_text_merged_fx_mixed.mp3 does not exist."):
+        mvg.create_meditation_video()
 
-    # TESTS OF THE BANNER GENERATION SYSTEM
     # add_banner_with_text()
     # image_path: str, banner_text: str, output_path: str
-    # 38. Check add_banner_with_text() raises for invalid image_path f"Error: add_banner_with_text - Image file does not exist: {image_path}"
-    mvg = MeditationVideoGenerator(force_working_dir_overwrite=True)
-    image_path = "i_do_not_exist.jpg"
     banner_text = "test"
     output_path = "output.jpg"
-    with pytest.raises(FileNotFoundError, match=f"Error: add_banner_with_text - Image file does not exist: {image_path}"):
-        mvg.add_banner_with_text(image_path, banner_text, output_path)
-
     # 39. check image_path is a valid image file
     # Error: add_banner_with_text - Failed to load image file
     # create a text file and name it as a jpg
-    with open(os.path.join(mvg.working_directory, "Mindfulness_meditation_image.jpg"), "w") as f:
+    with open(image_path, "w") as f:
         f.write("test")
-    image_path = os.path.join(mvg.working_directory, "Mindfulness_meditation_image.jpg")
     with pytest.raises(ValueError, match="Error: add_banner_with_text - Failed to load image file"):
         mvg.add_banner_with_text(image_path, banner_text, output_path)
 
     # 40. check banner_text is a non-empty string
     # create a 200 x 200 pixel image
     black_pixel = np.zeros((200, 200, 3), dtype=np.uint8)
-    image_path = os.path.join(mvg.working_directory, "Mindfulness_meditation_image.jpg")
-    black_pixel = ImageClip(black_pixel)
-    black_pixel.save_frame(image_path)
+    Image.fromarray(black_pixel).save(image_path, format="JPEG")
     banner_text = ""
     with pytest.raises(ValueError, match="banner text is empty"):
         mvg.add_banner_with_text(image_path, banner_text, output_path)
 
     # 41. check image not too small
     black_pixel = np.zeros((10, 10, 3), dtype=np.uint8)
-    image_path = os.path.join(mvg.working_directory, "Mindfulness_meditation_image.jpg")
-    black_pixel = ImageClip(black_pixel)
-    black_pixel.save_frame(image_path)
+    Image.fromarray(black_pixel).save(image_path, format="JPEG")
     banner_text = ""
     with pytest.raises(ValueError, match="Image dimensions too small"):
         mvg.add_banner_with_text(image_path, banner_text, output_path)
     # 42. check self.banner_height_ratio is valid - LEAVE OUT - Too hard to simulate
     # 43. check self.banner_font_size is valid - LEAVE OUT- Too hard to simulate
     # 44. check output path directory exists
-    image_path = os.path.join(mvg.working_directory, "Mindfulness_meditation_image.jpg")
     black_pixel = np.zeros((200, 200, 3), dtype=np.uint8)
-    black_pixel = ImageClip(black_pixel)
-    black_pixel.save_frame(image_path)
+    Image.fromarray(black_pixel).save(image_path, format="JPEG")
     banner_text = "test"
     output_path = os.path.join(mvg.working_directory, "does_not_exist", "output.jpg")
     with pytest.raises(FileNotFoundError, match=f"Error: add_banner_with_text - Output directory does not exist: {os.path.join(mvg.working_directory, 'does_not_exist')}"):
         mvg.add_banner_with_text(image_path, banner_text, output_path)
-
-    # delete the black pixel file
-    if os.path.exists(os.path.join(mvg.working_directory, "Mindfulness_meditation_image.jpg")):
-        os.remove(os.path.join(mvg.working_directory, "Mindfulness_meditation_image.jpg"))
-
-    # remove output.mp3
-    if os.path.exists("output.mp3"):
-        os.remove("output.mp3")
-    # remove merged_output.mp3
-    if os.path.exists("merged_output.mp3"):
-        os.remove("merged_output.mp3")
-
-    if os.path.exists("fakefile1.mp3"):
-        # remove fakefile1.mp3 etc
-        for i in range(1, 4):
-            os.remove(f"fakefile{i}.mp3")
-        # empty the working directory
-        for file in os.listdir(mvg.working_directory):
-            os.remove(os.path.join(mvg.working_directory, file))
-        # delete the working directory
-        shutil.rmtree(mvg.working_directory)
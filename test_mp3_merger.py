@@ -1,42 +1,41 @@
 import pytest
 from pydub import AudioSegment
-from pydub.generators import WhiteNoise, Sine
-from meditation_video_generator.mp3_merger import MP3Merger
+from pydub.generators import WhiteNoise
+from pydub.silence import split_on_silence
+from pydub.utils import mediainfo
+from meditation_video_generator.mp3_merger import MP3Merger, _nonsilent_ranges, _pan
+from meditation_video_generator import mp3_merger as mp3_merger_module
+import io
 import os
+import shutil
+from pathlib import Path
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
 
 
-def noise_merge(N: int):
-    test_dir = "test_mp3_merger"
-    # Create the test directory if it does not exist
-
-    # Delete it if it exists
-    if os.path.isdir(test_dir):
-        # Clear out files
-        for file in os.listdir(test_dir):
-            os.remove(f"{test_dir}/{file}")
-        os.rmdir(test_dir)
-    os.makedirs(test_dir)
-
+def noise_merge(N: int, test_dir: str):
+    # The merger needs real MP3 files, so they are written to test_dir
     noise_duration = 1000
+    # One second of 16 bit mono white noise, synthesised with numpy and encoded once, then
+    # written to each file
+    num_samples = 44100 * noise_duration // 1000
+    noise_samples = np.random.default_rng().integers(-32768, 32767, size=num_samples, dtype=np.int16, endpoint=True)
+    noise = AudioSegment(data=noise_samples.tobytes(), sample_width=2, frame_rate=44100, channels=1)
+    noise_mp3 = noise.export(io.BytesIO(), format="mp3").getvalue()
     for i in range(N):
-        noise = WhiteNoise()
-        noise_segment = noise.to_audio_segment(duration=noise_duration)  # 1 second
-        noise_segment.export(f"{test_dir}/noise_{i}.mp3", format="mp3")
+        Path(f"{test_dir}/noise_{i}.mp3").write_bytes(noise_mp3)
 
     # Test the mp3 merger using the generated noise files
     files = [f"{test_dir}/noise_{i}.mp3" for i in range(N)]
     total_test_duration = 2 * N * int(noise_duration / 1000) + 1
     mp3_merger = MP3Merger(files, duration=total_test_duration)
+    mp3_merger.output_file = f"{test_dir}/{mp3_merger.output_file}"
 
     mp3_merger.merge()
     print(f"Merged MP3 file saved as {mp3_merger.output_file}")
 
-    # Load in the mp3 and test it contains the correct number of tones
-    merged_mp3 = AudioSegment.from_mp3(mp3_merger.output_file)
-    duration = merged_mp3.duration_seconds
+    # Read the duration from the MP3 header with ffprobe, which does not decode the file (it
+    # includes the encoder's few tens of ms of padding, well inside the tolerance below)
+    duration = float(mediainfo(mp3_merger.output_file)["duration"])
     print(f"Total duration of merged MP3 file: {duration} seconds")
     print("Expected duration with buffers: ", total_test_duration +
           mp3_merger.rear_buffer / 1000 + mp3_merger.front_buffer / 1000)
@@ -45,24 +44,22 @@ def noise_merge(N: int):
     assert pytest.approx(duration,
                          0.01) == total_test_duration + mp3_merger.rear_buffer / 1000 + mp3_merger.front_buffer / 1000
 
-    # Convert to a numpy array
-    audio_array = merged_mp3.get_array_of_samples()
-    # Do an amplitude analysis to find the number of tones
-    audio_array = np.abs(np.array(audio_array))
-    # Threshold the audio array at power = +/- 1
-    audio_array = np.where(audio_array > 1, 1, 0)
-
-    # Clean up all files
-    for file in os.listdir(test_dir):
-        os.remove(f"{test_dir}/{file}")
-    os.rmdir(test_dir)
-
-    # Delete output file
-    os.remove(mp3_merger.output_file)
-
     PLOT = False
     if PLOT:
-        matplotlib.use('TkAgg')  # for PyCharm
+        # matplotlib is only needed for this plot, so it is not imported otherwise
+        try:
+            import matplotlib
+            matplotlib.use('TkAgg')  # for PyCharm
+            import matplotlib.pyplot as plt
+        except ImportError:
+            print("matplotlib (with Tk) is not available, so the plot is skipped")
+            return
+        # Load in the mp3 (only the plot needs its samples) to show the tones
+        merged_mp3 = AudioSegment.from_mp3(mp3_merger.output_file)
+        # View the 16 bit samples as a numpy array (no copy) and do an amplitude analysis
+        # to find the number of tones, thresholding at power = +/- 1
+        audio_array = np.frombuffer(merged_mp3.raw_data, dtype=np.int16)
+        audio_array = np.abs(audio_array) > 1
         # Plot against seconds not samples
         x_seconds = np.linspace(0, duration, len(audio_array))
         plt.plot(x_seconds, audio_array)
@@ -72,94 +69,137 @@ def noise_merge(N: int):
         plt.show()
 
 
-def test_noise_merge():
-    noise_merge(2)
-    noise_merge(4)
-    noise_merge(5)
-    noise_merge(10)
-
-
-def test_edge_cases():
-    # Test the edge cases of the mp3 merger
-    # Create a fake mp3 called test.mp3 which is just a text file
-    with open("test.mp3", "w") as f:
-        f.write("hello")
-    with open("test2.mp3", "w") as f:
-        f.write("hello")
-
+@pytest.mark.parametrize("N", [2, 4, 5, 10])
+def test_noise_merge(N, test_dir):
+    # each N works in its own test_dir, so the cases can run side by side
+    noise_merge(N, str(test_dir))
+
+
+def test_nonsilent_ranges(sine_440):
+    # The numpy silence detection must cut the audio exactly where pydub's split_on_silence does
+    tone = sine_440(1200)
+    quiet = WhiteNoise().to_audio_segment(duration=1500) - 70
+    audio = ((tone + quiet + tone - 20) + AudioSegment.silent(400) + tone + quiet).set_frame_rate(24000)
+    for min_silence_len, silence_thresh in [(800, -50), (300, -50), (1000, -60)]:
+        expected = [len(chunk) for chunk in split_on_silence(audio, min_silence_len=min_silence_len,
+                                                             silence_thresh=silence_thresh)]
+        ranges = _nonsilent_ranges(audio, min_silence_len, silence_thresh)
+        assert [end - start for start, end in ranges] == expected
+
+
+def test_pan_mono(sine_440):
+    # Panning mono audio must give stereo audio of the same length, exactly like AudioSegment.pan
+    tone = sine_440(1000)
+    for pan_amount in [-1, -0.3, 0, 0.5, 1]:
+        expected = tone.pan(pan_amount)
+        panned = _pan(tone, pan_amount)
+        assert (panned.channels, panned.frame_width, len(panned)) == \
+               (expected.channels, expected.frame_width, len(expected))
+        assert panned.raw_data == expected.raw_data
+
+
+def test_merged_segment_duration(sine_440_mp3, test_dir):
+    # The merged segment kept for MP3Mixer must be as long as the exported file (the parts are mono)
+    for i in range(2):
+        Path(f"mono_{i}.mp3").write_bytes(sine_440_mp3(2000))
+    mp3_merger = MP3Merger(["mono_0.mp3", "mono_1.mp3"], duration=8)
+    mp3_merger.merge()
+    exported = AudioSegment.from_mp3(mp3_merger.output_file)
+    assert mp3_merger.merged_segment.channels == exported.channels == 2
+    assert mp3_merger.merged_segment.duration_seconds == pytest.approx(exported.duration_seconds, abs=0.1)
+
+
+def test_spread_out_workers(sine_440_mp3, test_dir, monkeypatch):
+    # The files are spread out in this process unless max_workers asks for a process pool
+    tone = AudioSegment.from_mp3(io.BytesIO(sine_440_mp3(1000)))
+    phrases = tone + AudioSegment.silent(1000) + tone
+    real_pool = mp3_merger_module.ProcessPoolExecutor
+    pools = []
+
+    def pool(*args, **kwargs):
+        pools.append(kwargs)
+        return real_pool(*args, **kwargs)
+
+    monkeypatch.setattr(mp3_merger_module, "ProcessPoolExecutor", pool)
+    for max_workers, expected_pools in [(1, []), (2, [{"max_workers": 2}])]:
+        files = [f"spread_{max_workers}_{i}.mp3" for i in range(3)]
+        for file in files:
+            phrases.export(file, format="mp3")
+        pools.clear()
+        mp3_merger = MP3Merger(files, duration=60, silence_add=3000, max_workers=max_workers)
+        mp3_merger.spread_out_all_files()
+        assert pools == expected_pools
+        # either way the 1 s gap in each file becomes 2-4 s
+        for file in files:
+            assert os.path.exists(f"{Path(file).stem}_original.mp3")
+            assert 3900 < len(mp3_merger._preloaded[file]) < 6100
+
+
+@pytest.fixture
+def fake_files(test_dir):
+    """Runs the test in test_dir, with fake mp3s called test.mp3 and test2.mp3 (and a test.txt)
+    which are just text files."""
+    for name in ["test.mp3", "test2.mp3", "test.txt"]:
+        Path(name).write_text("hello")
+    return test_dir
+
+
+INVALID_CASES = [
     # 0. At least two MP3 files are required
-    with pytest.raises(ValueError, match="At least two MP3 files are required."):
-        mp3_merger = MP3Merger(["test.mp3"], duration=10)
-        mp3_merger.merge()
-
+    pytest.param(["test.mp3"], {"duration": 10}, "At least two MP3 files are required.", id="one_file"),
     # 1. No MP3 files provided
-    with pytest.raises(ValueError, match="No MP3 files provided."):
-        mp3_merger = MP3Merger([], duration=10)
-        mp3_merger.merge()
-
+    pytest.param([], {"duration": 10}, "No MP3 files provided.", id="no_files"),
     # 2. Duration must be greater than zero
-    with pytest.raises(ValueError, match="Duration must be greater than zero."):
-        mp3_merger = MP3Merger(["test.mp3", "test2.mp3"], duration=0)
-        mp3_merger.merge()
-    with pytest.raises(ValueError, match="Duration must be greater than zero."):
-        mp3_merger = MP3Merger(["test.mp3", "test2.mp3"], duration=-1)
-        mp3_merger.merge()
-
+    pytest.param(["test.mp3", "test2.mp3"], {"duration": 0}, "Duration must be greater than zero.", id="zero_duration"),
+    pytest.param(["test.mp3", "test2.mp3"], {"duration": -1}, "Duration must be greater than zero.",
+                 id="negative_duration"),
     # 3. All input files must exist
-    with pytest.raises(ValueError, match="All input files must exist."):
-        mp3_merger = MP3Merger(["idontexist.mp3", "test2.mp3"], duration=10)
-        mp3_merger.merge()
-
+    pytest.param(["idontexist.mp3", "test2.mp3"], {"duration": 10}, "All input files must exist.", id="missing_file"),
     # 4. All input files must be in MP3 format
-    with open("test.txt", "w") as f:
-        f.write("hello")
-    with pytest.raises(ValueError, match="All input files must be in MP3 format."):
-        mp3_merger = MP3Merger(["test.txt", "test2.mp3"], duration=10)
-        mp3_merger.merge()
-    os.remove("test.txt")
-
+    pytest.param(["test.txt", "test2.mp3"], {"duration": 10}, "All input files must be in MP3 format.", id="not_mp3"),
     # 5. Front buffer must be positive
-    with pytest.raises(ValueError, match="Front buffer must be positive."):
-        mp3_merger = MP3Merger(["test.mp3", "test2.mp3"], duration=10, front_buffer=-1)
-        mp3_merger.merge()
+    pytest.param(["test.mp3", "test2.mp3"], {"duration": 10, "front_buffer": -1}, "Front buffer must be positive.",
+                 id="negative_front_buffer"),
     # Rear buffer must be positive
-    with pytest.raises(ValueError, match="Rear buffer must be positive."):
-        mp3_merger = MP3Merger(["test.mp3", "test2.mp3"], duration=10, rear_buffer=-1)
-        mp3_merger.merge()
-
+    pytest.param(["test.mp3", "test2.mp3"], {"duration": 10, "rear_buffer": -1}, "Rear buffer must be positive.",
+                 id="negative_rear_buffer"),
     # 6. Balance for odd segments must be between -1 and 1
-    with pytest.raises(ValueError, match="Balance for odd segments must be between -1 and 1."):
-        mp3_merger = MP3Merger(["test.mp3", "test2.mp3"], duration=10, balance_odd=-2)
-        mp3_merger.merge()
-    with pytest.raises(ValueError, match="Balance for odd segments must be between -1 and 1."):
-        mp3_merger = MP3Merger(["test.mp3", "test2.mp3"], duration=10, balance_odd=2)
-        mp3_merger.merge()
-
+    pytest.param(["test.mp3", "test2.mp3"], {"duration": 10, "balance_odd": -2},
+                 "Balance for odd segments must be between -1 and 1.", id="balance_odd_too_low"),
+    pytest.param(["test.mp3", "test2.mp3"], {"duration": 10, "balance_odd": 2},
+                 "Balance for odd segments must be between -1 and 1.", id="balance_odd_too_high"),
     # 7. Balance for even segments must be between -1 and 1
-    with pytest.raises(ValueError, match="Balance for even segments must be between -1 and 1."):
-        mp3_merger = MP3Merger(["test.mp3", "test2.mp3"], duration=10, balance_even=-2)
-        mp3_merger.merge()
-    with pytest.raises(ValueError, match="Balance for even segments must be between -1 and 1."):
-        mp3_merger = MP3Merger(["test.mp3", "test2.mp3"], duration=10, balance_even=2)
+    pytest.param(["test.mp3", "test2.mp3"], {"duration": 10, "balance_even": -2},
+                 "Balance for even segments must be between -1 and 1.", id="balance_even_too_low"),
+    pytest.param(["test.mp3", "test2.mp3"], {"duration": 10, "balance_even": 2},
+                 "Balance for even segments must be between -1 and 1.", id="balance_even_too_high"),
+]
+
+
+@pytest.mark.parametrize("mp3_files, kwargs, match", INVALID_CASES)
+def test_invalid_arguments(fake_files, mp3_files, kwargs, match):
+    # Test the edge cases of the mp3 merger that fail validation
+    with pytest.raises(ValueError, match=match):
+        mp3_merger = MP3Merger(mp3_files, **kwargs)
         mp3_merger.merge()
 
+
+def test_edge_cases(sine_440_mp3, test_dir):
+    # Test the edge cases of the mp3 merger, in test_dir
+
     # 8. test when total voice duration is greater than the silence duration
-    # generate 6 11 second files of sine waves
-    for i in range(6):
-        with open(f"merge_test{i}.mp3", "wb") as f:
-            Sine(440).to_audio_segment(duration=11000).export(f, format="mp3")
+    # generate 6 11 second files of sine waves, all links to the same MP3
+    files = [f"merge_test{i}.mp3" for i in range(6)]
+    Path(files[0]).write_bytes(sine_440_mp3(11000))
+    for file in files[1:]:
+        try:
+            os.link(files[0], file)
+        except OSError:  # no hard links on this file system
+            shutil.copyfile(files[0], file)
     # check value error is raised and includes text: Total duration of input MP3 files exceeds the target duration.
     with pytest.raises(ValueError, match="Total duration of input MP3 files exceeds the target duration."):
-        mp3_merger = MP3Merger([f"merge_test{i}.mp3" for i in range(6)], duration=60)
+        mp3_merger = MP3Merger(files, duration=60)
         mp3_merger.merge()
-    # delete test files
-    for i in range(6):
-        os.remove(f"merge_test{i}.mp3")
-
-
-    # Delete test files
-    os.remove("test.mp3")
-    os.remove("test2.mp3")
 
 # Uncomment the line below to run tests directly if this script is executed
 # pytest.main(["-v"])
@@ -1,80 +1,51 @@
 import pytest
 from pydub import AudioSegment
-from pydub.generators import Sine
 from pydub.generators import WhiteNoise
 from meditation_video_generator.mp3_mixer import MP3Mixer
 import os
+from pathlib import Path
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
-
-# Use tkinter for matplotlib
-matplotlib.use('TkAgg')
-
-
-def noise_mix():
-    test_dir = "test_mp3_mixer"
-    # Create the test directory if it does not exist
-    if os.path.isdir(test_dir):
-        # Clear out files
-        for file in os.listdir(test_dir):
-            if os.path.isfile(f"{test_dir}/{file}"):
-                os.remove(f"{test_dir}/{file}")
-            else:
-                os.rmdir(f"{test_dir}/{file}")
-        os.rmdir(test_dir)
-    os.makedirs(test_dir)
-
-    # Clean up all files
-    for file in os.listdir(test_dir):
-        os.remove(f"{test_dir}/{file}")
-    os.rmdir(test_dir)
-
-
-def test_edge_cases():
-    test_dir = "test_mp3_mixer"
-    # Create the test directory if it does not exist
-    if not os.path.isdir(test_dir):
-        os.makedirs(test_dir)
-    else:
-        # If it does exist, clear out all files
-        for file in os.listdir(test_dir):
-            if os.path.isfile(f"{test_dir}/{file}"):
-                os.remove(f"{test_dir}/{file}")
-            else:
-                for filename in os.listdir(f"{test_dir}/{file}"):
-                    os.remove(f"{test_dir}/{file}/{filename}")
-                os.rmdir(f"{test_dir}/{file}")
-
-    # Create fake MP3 files for overlay ambient
-    with open(f"{test_dir}/test.mp3", "wb") as f:
-        # one second tone 440 Hz as audiosegment to mp3 to f
-        Sine(440).to_audio_segment(duration=1000).export(f, format="mp3")
-    with open(f"{test_dir}/test2.mp3", "wb") as f:
-        #WhiteNoise().to_audio_segment(duration=1000).export(f, format="mp3")
-        Sine(440).to_audio_segment(duration=1000).export(f, format="mp3")
-    with open(f"{test_dir}/test3_shorter.mp3", "wb") as f:
-        Sine(440).to_audio_segment(duration=500).export(f, format="mp3")
-        #WhiteNoise().to_audio_segment(duration=500).export(f, format="mp3")
-    with open(f"{test_dir}/test4_silent.mp3", "wb") as f:
-        AudioSegment.silent(duration=1000).export(f, format="mp3")
+
+
+def samples(audio: AudioSegment) -> np.ndarray:
+    # The 16 bit samples, interleaved by channel, as a view onto pydub's buffer (no copy)
+    return np.frombuffer(audio.raw_data, dtype=np.int16)
+
+
+def half_energies(audio: AudioSegment):
+    # Sum of absolute sample values in each half of the audio, in a single pass over the samples.
+    # The halves are split on a frame boundary, so a stereo frame is never split between them
+    audio_samples = samples(audio)
+    mid = len(audio_samples) // audio.channels // 2 * audio.channels
+    return np.add.reduceat(np.abs(audio_samples, dtype=np.int64), [0, mid])
+
+
+def test_edge_cases(sine_440, sine_440_mp3, test_dir):
+    # test_dir is also the working directory, so mix_audio's output.mp3 goes there as well
+    # overlay_ambient decodes any format, so its inputs are WAVs, which skip the MP3 encode and decode
+    sine_440(1000).export(f"{test_dir}/test.wav", format="wav")
+    sine_440(1000).export(f"{test_dir}/test2.wav", format="wav")
+    sine_440(500).export(f"{test_dir}/test3_shorter.wav", format="wav")
+    # mix_audio only accepts an MP3 file
+    # one second tone 440 Hz, encoded once per session
+    Path(f"{test_dir}/test.mp3").write_bytes(sine_440_mp3(1000))
 
     # 1. Test for unfound spoken_file_a
-    mp3_mixer = MP3Mixer(mp3_file="not_used_in_test.mp3")
-    spoken_file_a = f"{test_dir}/i_dont_exist.mp3"
-    ambient_file_b = f"{test_dir}/test2.mp3"
+    mp3_mixer = MP3Mixer(mp3_file="not_used_in_test.mp3", ambient_cache_dir=str(test_dir / "overlay_cache"))
+    spoken_file_a = f"{test_dir}/i_dont_exist.wav"
+    ambient_file_b = f"{test_dir}/test2.wav"
     with pytest.raises(FileNotFoundError):
         mp3_mixer.overlay_ambient(spoken_file_a=spoken_file_a, ambient_file_b=ambient_file_b)
 
     # 2. Test for unfound ambient file
-    spoken_file_a = f"{test_dir}/test.mp3"
-    ambient_file_b = f"{test_dir}/i_dont_exist.mp3"
+    spoken_file_a = f"{test_dir}/test.wav"
+    ambient_file_b = f"{test_dir}/i_dont_exist.wav"
     with pytest.raises(FileNotFoundError):
         mp3_mixer.overlay_ambient(spoken_file_a=spoken_file_a, ambient_file_b=ambient_file_b)
 
     # 3. Test for shorter ambient file
-    spoken_file_a = f"{test_dir}/test.mp3"
-    ambient_file_b = f"{test_dir}/test3_shorter.mp3"
+    spoken_file_a = f"{test_dir}/test.wav"
+    ambient_file_b = f"{test_dir}/test3_shorter.wav"
     with pytest.raises(ValueError):
         mp3_mixer.overlay_ambient(spoken_file_a=spoken_file_a, ambient_file_b=ambient_file_b)
 
@@ -82,21 +53,21 @@ def test_edge_cases():
     mp3_mixer.num_samples_to_chop = 0
     mp3_mixer.fade_in_time = 0
     mp3_mixer.fade_out_time = 0
-    spoken_file_a = f"{test_dir}/test.mp3"
-    ambient_file_b = f"{test_dir}/test.mp3"
+    spoken_file_a = f"{test_dir}/test.wav"
+    ambient_file_b = f"{test_dir}/test.wav"
     result = mp3_mixer.overlay_ambient(spoken_file_a=spoken_file_a, ambient_file_b=ambient_file_b)
     assert result.duration_seconds == 1.0
 
     # 5. Test for shorter spoken file
-    spoken_file_a = f"{test_dir}/test3_shorter.mp3"
-    ambient_file_b = f"{test_dir}/test2.mp3"
+    spoken_file_a = f"{test_dir}/test3_shorter.wav"
+    ambient_file_b = f"{test_dir}/test2.wav"
     result = mp3_mixer.overlay_ambient(spoken_file_a=spoken_file_a, ambient_file_b=ambient_file_b)
     assert result.duration_seconds == 0.5
 
     # 6. Test for fade in
     mp3_mixer.fade_in_time = 1
-    spoken_file_a = f"{test_dir}/test.mp3"
-    ambient_file_b = f"{test_dir}/test.mp3"
+    spoken_file_a = f"{test_dir}/test.wav"
+    ambient_file_b = f"{test_dir}/test.wav"
     result = mp3_mixer.overlay_ambient(spoken_file_a=spoken_file_a, ambient_file_b=ambient_file_b)
     assert result.duration_seconds == 1.0
 
@@ -117,36 +88,24 @@ def test_edge_cases():
     mp3_mixer.fade_out_time = 0
     #mp3_mixer.power_ratio = 100 #mp3_mixer.power_ratio/100  # lower_voice part
     # spoken_file_a = f"{test_dir}/test4_silent.mp3"
-    spoken_file_a = f"{test_dir}/test.mp3"
-    ambient_file_b = f"{test_dir}/test2.mp3"
+    spoken_file_a = f"{test_dir}/test.wav"
+    ambient_file_b = f"{test_dir}/test2.wav"
     result = mp3_mixer.overlay_ambient(spoken_file_a=spoken_file_a, ambient_file_b=ambient_file_b)
-    result_np = np.array(result.get_array_of_samples())
-    first_half = result_np[:len(result_np) // 2]
-    second_half = result_np[len(result_np) // 2:]
-    energy_first_half = np.sum(np.abs(first_half))
-    energy_second_half = np.sum(np.abs(second_half))
+    energy_first_half, energy_second_half = half_energies(result)
     assert energy_first_half < energy_second_half
 
     # 10. Test fade out makes first half of file higher energy than second half of file
     mp3_mixer.fade_in_time = 0
     mp3_mixer.fade_out_time = 1
     result = mp3_mixer.overlay_ambient(spoken_file_a=spoken_file_a, ambient_file_b=ambient_file_b)
-    result_np = np.array(result.get_array_of_samples())
-    first_half = result_np[:len(result_np) // 2]
-    second_half = result_np[len(result_np) // 2:]
-    energy_first_half = np.sum(np.abs(first_half))
-    energy_second_half = np.sum(np.abs(second_half))
+    energy_first_half, energy_second_half = half_energies(result)
     assert energy_first_half > energy_second_half
 
     # 11. Test that a 1-second fade in and fade out give an energy ratio of first to second half close to 1
     mp3_mixer.fade_in_time = 1
     mp3_mixer.fade_out_time = 1
     result = mp3_mixer.overlay_ambient(spoken_file_a=spoken_file_a, ambient_file_b=ambient_file_b)
-    result_np = np.array(result.get_array_of_samples())
-    first_half = result_np[:len(result_np) // 2]
-    second_half = result_np[len(result_np) // 2:]
-    energy_first_half = np.sum(np.abs(first_half))
-    energy_second_half = np.sum(np.abs(second_half))
+    energy_first_half, energy_second_half = half_energies(result)
     assert 0.9 < energy_first_half / energy_second_half < 1.1
 
     # 12. Test a negative fade in
@@ -207,10 +166,19 @@ def test_edge_cases():
         mp3_mixer.mix_audio()
 
     # 21. If binaural is false then start_beat_freq, end_beat_freq, binaural_fade_out_duration, and base_freq can have any values
+    # (mixed with an ambient file of its own, so nothing is written to the package's ambient_files)
+    ambient_dir = test_dir / "ambient"
+    ambient_dir.mkdir()
+    (ambient_dir / "ambient.mp3").write_bytes(sine_440_mp3(1000))
     mp3_mixer = MP3Mixer(mp3_file=mp3_file, start_beat_freq=-1, end_beat_freq=-1,
-                         base_freq=-1, binaural_fade_out_duration=-1, binaural=False)
+                         base_freq=-1, binaural_fade_out_duration=-1, binaural=False,
+                         sounds_dir=str(ambient_dir), num_samples_to_chop=0,
+                         ambient_cache_dir=str(test_dir / "cache"))
     result = mp3_mixer.mix_audio()
     assert result == "output.mp3"
+    # the decoded ambient file is cached in ambient_cache_dir, not next to the ambient file
+    assert os.listdir(ambient_dir) == ["ambient.mp3"]
+    assert len(os.listdir(test_dir / "cache")) == 1
     # delete the output file
     os.remove("output.mp3")
 
@@ -245,11 +213,11 @@ def test_edge_cases():
     with pytest.raises(ValueError):
         mp3_mixer.mix_audio()
 
-    # end of tests
-    # empty and remove the test directory
-    for file in os.listdir(test_dir):
-        os.remove(f"{os.path.join(os.getcwd(),test_dir,file)}")
-    os.rmdir(test_dir)
+    # 26. Audio handed over in memory is mixed without needing mp3_file
+    mp3_mixer = MP3Mixer(mp3_file="", binaural=True, audio_segment=sine_440(1000))
+    result = mp3_mixer.mix_audio()
+    assert AudioSegment.from_mp3(result).duration_seconds == pytest.approx(1.0, abs=0.1)
+    os.remove(result)
 
 
 